@@ -2,17 +2,36 @@
 from flask import Flask, jsonify, request, send_from_directory, send_file
 from flask_cors import CORS
 from flask_sqlalchemy import SQLAlchemy
-from datetime import datetime
+from sqlalchemy import event
+from werkzeug.middleware.proxy_fix import ProxyFix
+from datetime import datetime, timedelta
+import json
 import os
+import click
 from config import Config
+from archive import ArchiveError, PasienArchive, contains_predicate, sort_kunjungan, label_tahun_ajaran
+from scheduler import Scheduler
+from throttle import Throttle
+from idempotency import Idempotency
+from reports import ReportManager, FORMATS as REPORT_FORMATS
+from backup import BackupManager, enable_sqlite_wal
 
 # Initialize Flask app with static folder pointing to frontend
 app = Flask(__name__, static_folder='../frontend', static_url_path='')
 app.config.from_object(Config)
 
+# IP klien diambil dari X-Forwarded-For hanya sejauh proxy yang dipercaya
+if app.config['TRUSTED_PROXY_HOPS']:
+    app.wsgi_app = ProxyFix(
+        app.wsgi_app,
+        x_for=app.config['TRUSTED_PROXY_HOPS'],
+        x_proto=app.config['TRUSTED_PROXY_HOPS']
+    )
+
 # Initialize extensions
 db = SQLAlchemy(app)
 CORS(app, origins=['*'])  # Allow all origins for deployment
+throttle = Throttle(app)
 
 # Define models here to avoid circular imports
 class Obat(db.Model):
@@ -43,6 +62,8 @@ class Obat(db.Model):
 class Pasien(db.Model):
     """Model untuk data kunjungan pasien"""
     __tablename__ = 'pasien'
+    # Id kunjungan yang sudah diarsipkan tidak boleh dipakai ulang
+    __table_args__ = {'sqlite_autoincrement': True}
     
     id = db.Column(db.Integer, primary_key=True)
     nama = db.Column(db.String(100), nullable=False)
@@ -67,9 +88,371 @@ class Pasien(db.Model):
             'created_at': self.created_at.isoformat() if self.created_at else None
         }
 
+class SchedulerLock(db.Model):
+    """Lock leader scheduler, hanya satu worker yang menjalankan job"""
+    __tablename__ = 'scheduler_lock'
+    
+    name = db.Column(db.String(50), primary_key=True)
+    owner = db.Column(db.String(100), nullable=False)
+    expires_at = db.Column(db.DateTime, nullable=False)
+    
+    def to_dict(self):
+        return {
+            'name': self.name,
+            'owner': self.owner,
+            'expires_at': self.expires_at.isoformat() if self.expires_at else None
+        }
+
+class JobRun(db.Model):
+    """Riwayat eksekusi job background"""
+    __tablename__ = 'job_run'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    job_name = db.Column(db.String(100), nullable=False, index=True)
+    trigger = db.Column(db.String(20), nullable=False, default='schedule')
+    worker = db.Column(db.String(100))
+    started_at = db.Column(db.DateTime, nullable=False)
+    finished_at = db.Column(db.DateTime)
+    duration_ms = db.Column(db.Float)
+    status = db.Column(db.String(20), nullable=False)
+    message = db.Column(db.Text)
+    
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'job_name': self.job_name,
+            'trigger': self.trigger,
+            'worker': self.worker,
+            'started_at': self.started_at.isoformat() if self.started_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None,
+            'duration_ms': round(self.duration_ms, 2) if self.duration_ms is not None else None,
+            'status': self.status,
+            'message': self.message
+        }
+
+class StatistikCache(db.Model):
+    """Hasil precompute statistik yang diisi oleh job background"""
+    __tablename__ = 'statistik_cache'
+    
+    key = db.Column(db.String(50), primary_key=True)
+    value = db.Column(db.Text, nullable=False)
+    computed_for = db.Column(db.Date, nullable=False)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+# Baris khusus di statistik_cache: nomor generasi data, naik setiap obat/pasien berubah
+STATISTIK_GENERASI = '_generasi'
+
+class PasienArsip(db.Model):
+    """Arsip terkompresi kunjungan pasien, satu baris per tahun ajaran"""
+    __tablename__ = 'pasien_arsip'
+    
+    tahun = db.Column(db.Integer, primary_key=True)
+    versi = db.Column(db.Integer, nullable=False, default=0)
+    jumlah = db.Column(db.Integer, nullable=False, default=0)
+    ukuran_asli = db.Column(db.Integer, nullable=False, default=0)
+    data = db.Column(db.LargeBinary, nullable=False)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    def to_dict(self):
+        return {
+            'tahun': self.tahun,
+            'tahunAjaran': label_tahun_ajaran(self.tahun),
+            'versi': self.versi,
+            'jumlah': self.jumlah,
+            'ukuranAsli': self.ukuran_asli,
+            'ukuranTerkompresi': len(self.data) if self.data else 0,
+            'updated_at': self.updated_at.isoformat() if self.updated_at else None
+        }
+
+class IdempotencyKey(db.Model):
+    """Response tersimpan untuk write dengan header Idempotency-Key"""
+    __tablename__ = 'idempotency_key'
+    
+    key = db.Column(db.String(100), primary_key=True)
+    method = db.Column(db.String(10), nullable=False)
+    path = db.Column(db.String(200), nullable=False)
+    status_code = db.Column(db.Integer)
+    response_body = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+
+class ReportJob(db.Model):
+    """Job pembuatan laporan (CSV/XLSX/PDF) yang berjalan di background"""
+    __tablename__ = 'report_job'
+    
+    id = db.Column(db.String(32), primary_key=True)
+    jenis = db.Column(db.String(50), nullable=False)
+    format = db.Column(db.String(10), nullable=False)
+    params = db.Column(db.Text, nullable=False)
+    cache_key = db.Column(db.String(64), nullable=False, index=True)
+    status = db.Column(db.String(20), nullable=False, default='pending')
+    error = db.Column(db.Text)
+    ukuran = db.Column(db.Integer)
+    jumlah_baris = db.Column(db.Integer)
+    cached = db.Column(db.Boolean, nullable=False, default=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+    started_at = db.Column(db.DateTime)
+    finished_at = db.Column(db.DateTime)
+    duration_ms = db.Column(db.Float)
+    
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'jenis': self.jenis,
+            'format': self.format,
+            'params': json.loads(self.params),
+            'status': self.status,
+            'error': self.error,
+            'ukuran': self.ukuran,
+            'jumlah_baris': self.jumlah_baris,
+            'cached': self.cached,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None,
+            'duration_ms': round(self.duration_ms, 2) if self.duration_ms is not None else None,
+            'download_url': f'/api/laporan/{self.id}/unduh' if self.status == 'done' else None
+        }
+
 # Create database tables
 with app.app_context():
+    if db.engine.dialect.name == 'sqlite' and app.config['SQLITE_WAL']:
+        event.listen(db.engine, 'connect', enable_sqlite_wal)
     db.create_all()
+    if db.session.get(StatistikCache, STATISTIK_GENERASI) is None:
+        db.session.add(StatistikCache(key=STATISTIK_GENERASI, value='0', computed_for=datetime.now().date()))
+        db.session.commit()
+
+archive = PasienArchive(app, db, Pasien, PasienArsip)
+with app.app_context():
+    archive.ensure_unique_ids()
+idempotency = Idempotency(app, db, IdempotencyKey)
+reports = ReportManager(app, db, ReportJob)
+backups = BackupManager.from_config(app.config, app.instance_path)
+
+# ==================== STATISTIK HELPERS ====================
+
+def compute_dashboard_stats(today=None):
+    """Hitung statistik dashboard langsung dari database"""
+    today = today or datetime.now().date()
+    return {
+        'totalObat': Obat.query.count(),
+        'pasienHariIni': Pasien.query.filter_by(tanggal_kunjungan=today).count(),
+        # Low stock medicines (< 5)
+        'stokRendah': Obat.query.filter(Obat.stok < 5).count(),
+        'obatKadaluarsa': Obat.query.filter(Obat.tanggal_kadaluarsa < today).count()
+    }
+
+def compute_rekap_kadaluarsa(today=None, days_ahead=30):
+    """Rekap obat stok rendah, sudah kadaluarsa dan akan kadaluarsa dalam `days_ahead` hari"""
+    today = today or datetime.now().date()
+    batas = today + timedelta(days=days_ahead)
+    akan_kadaluarsa = Obat.query.filter(
+        Obat.tanggal_kadaluarsa >= today,
+        Obat.tanggal_kadaluarsa <= batas
+    ).order_by(Obat.tanggal_kadaluarsa).all()
+    sudah_kadaluarsa = Obat.query.filter(Obat.tanggal_kadaluarsa < today).order_by(Obat.tanggal_kadaluarsa).all()
+    stok_rendah = Obat.query.filter(Obat.stok < 5).all()
+    return {
+        'tanggal': today.isoformat(),
+        'stokRendah': [{'id': o.id, 'nama': o.nama, 'stok': o.stok} for o in stok_rendah],
+        'kadaluarsa': [{'id': o.id, 'nama': o.nama, 'tanggal_kadaluarsa': o.tanggal_kadaluarsa.isoformat()} for o in sudah_kadaluarsa],
+        'akanKadaluarsa': [{'id': o.id, 'nama': o.nama, 'tanggal_kadaluarsa': o.tanggal_kadaluarsa.isoformat()} for o in akan_kadaluarsa]
+    }
+
+def get_cached_statistik(key, today=None):
+    """Ambil statistik precompute, None jika belum ada atau dihitung untuk hari lain"""
+    today = today or datetime.now().date()
+    cache = db.session.get(StatistikCache, key)
+    if cache is None or cache.computed_for != today:
+        return None
+    return json.loads(cache.value)
+
+def statistik_generasi():
+    """Generasi data saat ini; baca sebelum menghitung statistik yang akan disimpan"""
+    generasi = db.session.scalar(
+        db.select(StatistikCache.value).where(StatistikCache.key == STATISTIK_GENERASI)
+    )
+    return int(generasi) if generasi is not None else 0
+
+def store_statistik(key, value, generasi, today=None):
+    """Simpan statistik yang dihitung pada `generasi`, False jika data berubah sejak itu
+
+    Baris generasi dikunci (UPDATE) sebelum dibandingkan: write obat/pasien yang
+    menaikkan generasi menunggu commit ini lalu menghapus hasilnya, atau sudah
+    ter-commit lebih dulu sehingga hasil yang basi tidak disimpan.
+    """
+    today = today or datetime.now().date()
+    # Akhiri snapshot baca dari perhitungan sebelum mengambil lock tulis
+    db.session.commit()
+    StatistikCache.query.filter_by(key=STATISTIK_GENERASI).update(
+        {'updated_at': datetime.utcnow()}, synchronize_session=False
+    )
+    if statistik_generasi() != generasi:
+        db.session.rollback()
+        return False
+    cache = db.session.get(StatistikCache, key)
+    if cache is None:
+        cache = StatistikCache(key=key)
+        db.session.add(cache)
+    cache.value = json.dumps(value)
+    cache.computed_for = today
+    cache.updated_at = datetime.utcnow()
+    db.session.commit()
+    return True
+
+def invalidate_statistik():
+    """Buang statistik precompute dan naikkan generasi setelah data obat/pasien berubah"""
+    StatistikCache.query.filter(StatistikCache.key != STATISTIK_GENERASI).delete(synchronize_session=False)
+    StatistikCache.query.filter_by(key=STATISTIK_GENERASI).update({
+        'value': db.cast(db.cast(StatistikCache.value, db.Integer) + 1, db.String),
+        'updated_at': datetime.utcnow()
+    }, synchronize_session=False)
+
+def parse_tanggal_range():
+    """Baca parameter dari/sampai (YYYY-MM-DD) dari query string; ValueError (-> 400) jika format salah"""
+    hasil = []
+    for field in ('dari', 'sampai'):
+        value = request.args.get(field)
+        try:
+            hasil.append(datetime.strptime(value, '%Y-%m-%d').date() if value else None)
+        except ValueError:
+            raise ValueError(f'{field} harus dengan format YYYY-MM-DD')
+    return tuple(hasil)
+
+def include_archive(dari, sampai):
+    """Arsip hanya dibaca jika diminta (arsip=1) atau rentang tanggal menyentuhnya
+
+    Tanpa dari/sampai hanya data aktif yang dikembalikan. Rentang tanpa `dari`
+    (hanya `sampai`) tidak punya batas bawah sehingga selalu menyentuh arsip.
+    """
+    if request.args.get('arsip') == '1':
+        return archive.reaches_archive(None)
+    if dari is None and sampai is None:
+        return False
+    return archive.reaches_archive(dari)
+
+def arsip_meta(included):
+    batas = archive.boundary()
+    return {
+        'batasArsip': batas.isoformat() if batas else None,
+        'termasukArsip': included
+    }
+
+# ==================== REPORT DEFINITIONS ====================
+
+KOLOM_KUNJUNGAN = [
+    ('tanggal_kunjungan', 'Tanggal', 10),
+    ('waktu_kunjungan', 'Waktu', 6),
+    ('nama', 'Nama', 18),
+    ('kelas_jabatan', 'Kelas/Jabatan', 12),
+    ('keluhan', 'Keluhan', 24),
+    ('diagnosa', 'Diagnosa', 18),
+    ('obat_diberikan', 'Obat Diberikan', 18)
+]
+
+KOLOM_OBAT = [
+    ('nama', 'Nama Obat', 20),
+    ('jenis', 'Jenis', 10),
+    ('stok', 'Stok', 6),
+    ('tanggal_kadaluarsa', 'Tanggal Kadaluarsa', 12),
+    ('status', 'Status', 12),
+    ('deskripsi', 'Deskripsi', 30)
+]
+
+def kunjungan_rows(dari, sampai):
+    """Kunjungan dalam rentang tanggal (termasuk arsip), urut naik"""
+    pasien_list = Pasien.query.filter(
+        Pasien.tanggal_kunjungan >= dari,
+        Pasien.tanggal_kunjungan <= sampai
+    ).all()
+    data = [pasien.to_dict() for pasien in pasien_list]
+    if archive.reaches_archive(dari):
+        data += archive.query(dari, sampai)
+    return sort_kunjungan(data, reverse=False)
+
+def kunjungan_version(dari, sampai):
+    """Berubah setiap ada kunjungan baru atau arsip berubah dalam rentang"""
+    jumlah, id_terakhir = db.session.query(db.func.count(Pasien.id), db.func.max(Pasien.id)).filter(
+        Pasien.tanggal_kunjungan >= dari,
+        Pasien.tanggal_kunjungan <= sampai
+    ).one()
+    arsip = [(a.tahun, a.versi) for a in PasienArsip.query.order_by(PasienArsip.tahun).all()]
+    return [jumlah, id_terakhir, arsip]
+
+def obat_version():
+    jumlah, id_terakhir, update_terakhir = db.session.query(
+        db.func.count(Obat.id), db.func.max(Obat.id), db.func.max(Obat.updated_at)
+    ).one()
+    return [jumlah, id_terakhir, update_terakhir.isoformat() if update_terakhir else None]
+
+def obat_rows(obat_list, today):
+    rows = []
+    for obat in obat_list:
+        row = obat.to_dict()
+        sisa = (obat.tanggal_kadaluarsa - today).days
+        row['status'] = 'Kadaluarsa' if sisa < 0 else ('Stok rendah' if obat.stok < 5 else f'{sisa} hari lagi')
+        rows.append(row)
+    return rows
+
+def _param_tanggal(raw, field, fmt, contoh):
+    """Ambil parameter tanggal berupa string; ValueError (-> 400) jika tipe/format salah"""
+    value = raw.get(field) or datetime.now().strftime(fmt)
+    if not isinstance(value, str):
+        raise ValueError(f'{field} harus berupa string dengan format {contoh}')
+    try:
+        datetime.strptime(value, fmt)
+    except ValueError:
+        raise ValueError(f'{field} harus dengan format {contoh}')
+    return value
+
+def params_harian(raw):
+    return {'tanggal': _param_tanggal(raw, 'tanggal', '%Y-%m-%d', 'YYYY-MM-DD')}
+
+def params_bulanan(raw):
+    return {'bulan': _param_tanggal(raw, 'bulan', '%Y-%m', 'YYYY-MM')}
+
+def params_kadaluarsa(raw):
+    hari = raw.get('hari', 30)
+    if isinstance(hari, str) and hari.isdigit():
+        hari = int(hari)
+    if isinstance(hari, bool) or not isinstance(hari, int) or not 0 <= hari <= 3650:
+        raise ValueError('hari harus berupa angka 0-3650')
+    # Tanggal hari ini ikut di parameter agar cache berganti setiap hari
+    return {'hari': hari, 'tanggal': datetime.now().strftime('%Y-%m-%d')}
+
+def rentang_bulan(bulan):
+    dari = datetime.strptime(bulan, '%Y-%m').date()
+    sampai = (dari.replace(day=28) + timedelta(days=4)).replace(day=1) - timedelta(days=1)
+    return dari, sampai
+
+def collect_harian(params):
+    tanggal = datetime.strptime(params['tanggal'], '%Y-%m-%d').date()
+    return f"Laporan Kunjungan Harian UKS - {tanggal.strftime('%d-%m-%Y')}", kunjungan_rows(tanggal, tanggal)
+
+def collect_bulanan(params):
+    dari, sampai = rentang_bulan(params['bulan'])
+    return f"Laporan Kunjungan Bulanan UKS - {dari.strftime('%m-%Y')}", kunjungan_rows(dari, sampai)
+
+def collect_inventaris(params):
+    today = datetime.now().date()
+    return 'Laporan Inventaris Obat UKS', obat_rows(Obat.query.order_by(Obat.nama).all(), today)
+
+def collect_kadaluarsa(params):
+    today = datetime.strptime(params['tanggal'], '%Y-%m-%d').date()
+    batas = today + timedelta(days=params['hari'])
+    obat_list = Obat.query.filter(Obat.tanggal_kadaluarsa <= batas).order_by(Obat.tanggal_kadaluarsa).all()
+    return f"Laporan Obat Kadaluarsa / {params['hari']} Hari ke Depan", obat_rows(obat_list, today)
+
+reports.register(
+    'kunjungan_harian', KOLOM_KUNJUNGAN, collect_harian,
+    lambda p: kunjungan_version(*([datetime.strptime(p['tanggal'], '%Y-%m-%d').date()] * 2)),
+    params_harian
+)
+reports.register(
+    'kunjungan_bulanan', KOLOM_KUNJUNGAN, collect_bulanan,
+    lambda p: kunjungan_version(*rentang_bulan(p['bulan'])),
+    params_bulanan
+)
+reports.register('inventaris', KOLOM_OBAT, collect_inventaris, lambda p: obat_version(), lambda raw: {})
+reports.register('kadaluarsa', KOLOM_OBAT, collect_kadaluarsa, lambda p: obat_version(), params_kadaluarsa)
 
 # ==================== BASIC ROUTES ====================
 
@@ -97,7 +480,9 @@ def api_info():
             'health': '/api/health',
             'obat': '/api/obat',
             'pasien': '/api/pasien',
-            'dashboard': '/api/dashboard'
+            'dashboard': '/api/dashboard',
+            'laporan': '/api/laporan',
+            'jobs': '/api/admin/jobs'
         }
     })
 
@@ -113,6 +498,7 @@ def health_check():
 # ==================== OBAT ENDPOINTS ====================
 
 @app.route('/api/obat', methods=['GET'])
+@throttle.coalesce
 def get_all_obat():
     try:
         obat_list = Obat.query.all()
@@ -128,6 +514,7 @@ def get_all_obat():
         }), 500
 
 @app.route('/api/obat', methods=['POST'])
+@idempotency.idempotent
 def add_obat():
     try:
         data = request.get_json()
@@ -151,6 +538,7 @@ def add_obat():
         )
         
         db.session.add(obat)
+        invalidate_statistik()
         db.session.commit()
         
         return jsonify({
@@ -167,9 +555,15 @@ def add_obat():
         }), 500
 
 @app.route('/api/obat/<int:obat_id>', methods=['PUT'])
+@idempotency.idempotent
 def update_obat(obat_id):
     try:
-        obat = Obat.query.get_or_404(obat_id)
+        obat = db.session.get(Obat, obat_id)
+        if obat is None:
+            return jsonify({
+                'success': False,
+                'message': 'Obat tidak ditemukan'
+            }), 404
         data = request.get_json()
         
         # Update fields
@@ -185,6 +579,7 @@ def update_obat(obat_id):
             obat.deskripsi = data['deskripsi']
         
         obat.updated_at = datetime.utcnow()
+        invalidate_statistik()
         db.session.commit()
         
         return jsonify({
@@ -203,8 +598,14 @@ def update_obat(obat_id):
 @app.route('/api/obat/<int:obat_id>', methods=['DELETE'])
 def delete_obat(obat_id):
     try:
-        obat = Obat.query.get_or_404(obat_id)
+        obat = db.session.get(Obat, obat_id)
+        if obat is None:
+            return jsonify({
+                'success': False,
+                'message': 'Obat tidak ditemukan'
+            }), 404
         db.session.delete(obat)
+        invalidate_statistik()
         db.session.commit()
         
         return jsonify({
@@ -222,12 +623,33 @@ def delete_obat(obat_id):
 # ==================== PASIEN ENDPOINTS ====================
 
 @app.route('/api/pasien', methods=['GET'])
+@throttle.coalesce
+@throttle.limit_concurrency
 def get_all_pasien():
     try:
-        pasien_list = Pasien.query.order_by(Pasien.tanggal_kunjungan.desc(), Pasien.waktu_kunjungan.desc()).all()
+        try:
+            dari, sampai = parse_tanggal_range()
+        except ValueError as e:
+            return jsonify({
+                'success': False,
+                'message': str(e)
+            }), 400
+        query = Pasien.query
+        if dari:
+            query = query.filter(Pasien.tanggal_kunjungan >= dari)
+        if sampai:
+            query = query.filter(Pasien.tanggal_kunjungan <= sampai)
+        pasien_list = query.order_by(Pasien.tanggal_kunjungan.desc(), Pasien.waktu_kunjungan.desc()).all()
+        data = [pasien.to_dict() for pasien in pasien_list]
+        
+        included = include_archive(dari, sampai)
+        if included:
+            data = sort_kunjungan(data + archive.query(dari, sampai))
+        
         return jsonify({
             'success': True,
-            'data': [pasien.to_dict() for pasien in pasien_list],
+            'data': data,
+            'arsip': arsip_meta(included),
             'message': 'Data pasien berhasil diambil'
         })
     except Exception as e:
@@ -237,6 +659,7 @@ def get_all_pasien():
         }), 500
 
 @app.route('/api/pasien', methods=['POST'])
+@idempotency.idempotent
 def add_pasien():
     try:
         data = request.get_json()
@@ -262,6 +685,7 @@ def add_pasien():
         )
         
         db.session.add(pasien)
+        invalidate_statistik()
         db.session.commit()
         
         return jsonify({
@@ -278,6 +702,8 @@ def add_pasien():
         }), 500
 
 @app.route('/api/pasien/search')
+@throttle.coalesce
+@throttle.limit_concurrency
 def search_pasien():
     try:
         query = request.args.get('q', '')
@@ -287,16 +713,35 @@ def search_pasien():
                 'message': 'Query parameter q is required'
             }), 400
         
-        pasien_list = Pasien.query.filter(
+        try:
+            dari, sampai = parse_tanggal_range()
+        except ValueError as e:
+            return jsonify({
+                'success': False,
+                'message': str(e)
+            }), 400
+        pasien_query = Pasien.query.filter(
             (Pasien.nama.contains(query)) |
             (Pasien.kelas_jabatan.contains(query)) |
             (Pasien.keluhan.contains(query))
-        ).order_by(Pasien.tanggal_kunjungan.desc()).all()
+        )
+        if dari:
+            pasien_query = pasien_query.filter(Pasien.tanggal_kunjungan >= dari)
+        if sampai:
+            pasien_query = pasien_query.filter(Pasien.tanggal_kunjungan <= sampai)
+        pasien_list = pasien_query.order_by(Pasien.tanggal_kunjungan.desc()).all()
+        data = [pasien.to_dict() for pasien in pasien_list]
+        
+        included = include_archive(dari, sampai)
+        if included:
+            predicate = contains_predicate(query, ('nama', 'kelas_jabatan', 'keluhan'))
+            data = sort_kunjungan(data + archive.query(dari, sampai, predicate))
         
         return jsonify({
             'success': True,
-            'data': [pasien.to_dict() for pasien in pasien_list],
-            'message': f'Ditemukan {len(pasien_list)} hasil pencarian'
+            'data': data,
+            'arsip': arsip_meta(included),
+            'message': f'Ditemukan {len(data)} hasil pencarian'
         })
         
     except Exception as e:
@@ -306,6 +751,7 @@ def search_pasien():
         }), 500
 
 @app.route('/api/pasien/harian')
+@throttle.coalesce
 def get_daily_report():
     try:
         date_str = request.args.get('date')
@@ -314,12 +760,17 @@ def get_daily_report():
         
         target_date = datetime.strptime(date_str, '%Y-%m-%d').date()
         pasien_list = Pasien.query.filter_by(tanggal_kunjungan=target_date).order_by(Pasien.waktu_kunjungan).all()
+        data = [pasien.to_dict() for pasien in pasien_list]
+        
+        # Old dates live in the archive
+        if archive.reaches_archive(target_date):
+            data = sort_kunjungan(data + archive.query(target_date, target_date), reverse=False)
         
         return jsonify({
             'success': True,
-            'data': [pasien.to_dict() for pasien in pasien_list],
+            'data': data,
             'date': date_str,
-            'total': len(pasien_list),
+            'total': len(data),
             'message': f'Laporan harian untuk {date_str}'
         })
         
@@ -332,29 +783,17 @@ def get_daily_report():
 # ==================== DASHBOARD ENDPOINTS ====================
 
 @app.route('/api/dashboard/stats')
+@throttle.coalesce
 def get_dashboard_stats():
     try:
-        # Get statistics
-        total_obat = Obat.query.count()
-        
-        # Patients today
-        today = datetime.now().date()
-        pasien_hari_ini = Pasien.query.filter_by(tanggal_kunjungan=today).count()
-        
-        # Low stock medicines (< 5)
-        stok_rendah = Obat.query.filter(Obat.stok < 5).count()
-        
-        # Expired medicines
-        obat_kadaluarsa = Obat.query.filter(Obat.tanggal_kadaluarsa < today).count()
+        # Use precomputed statistics when still valid for today
+        stats = get_cached_statistik('dashboard')
+        if stats is None:
+            stats = compute_dashboard_stats()
         
         return jsonify({
             'success': True,
-            'data': {
-                'totalObat': total_obat,
-                'pasienHariIni': pasien_hari_ini,
-                'stokRendah': stok_rendah,
-                'obatKadaluarsa': obat_kadaluarsa
-            },
+            'data': stats,
             'message': 'Statistik dashboard berhasil diambil'
         })
         
@@ -365,27 +804,40 @@ def get_dashboard_stats():
         }), 500
 
 @app.route('/api/dashboard/notifications')
+@throttle.coalesce
+@throttle.limit_concurrency
 def get_notifications():
     try:
         notifications = []
-        today = datetime.now().date()
+        now = datetime.now().isoformat()
+        
+        # Use precomputed recap when still valid for today
+        rekap = get_cached_statistik('kadaluarsa')
+        if rekap is None or 'stokRendah' not in rekap:
+            rekap = compute_rekap_kadaluarsa()
         
         # Check for low stock
-        low_stock_obat = Obat.query.filter(Obat.stok < 5).all()
-        for obat in low_stock_obat:
+        for obat in rekap['stokRendah']:
             notifications.append({
                 'type': 'warning',
-                'message': f'Stok {obat.nama} tinggal {obat.stok} unit',
-                'timestamp': datetime.now().isoformat()
+                'message': f"Stok {obat['nama']} tinggal {obat['stok']} unit",
+                'timestamp': now
             })
         
         # Check for expired medicines
-        expired_obat = Obat.query.filter(Obat.tanggal_kadaluarsa < today).all()
-        for obat in expired_obat:
+        for obat in rekap['kadaluarsa']:
             notifications.append({
                 'type': 'danger',
-                'message': f'{obat.nama} sudah kadaluarsa',
-                'timestamp': datetime.now().isoformat()
+                'message': f"{obat['nama']} sudah kadaluarsa",
+                'timestamp': now
+            })
+        
+        # Medicines expiring within 30 days
+        for obat in rekap['akanKadaluarsa']:
+            notifications.append({
+                'type': 'info',
+                'message': f"{obat['nama']} akan kadaluarsa pada {obat['tanggal_kadaluarsa']}",
+                'timestamp': now
             })
         
         if not notifications:
@@ -407,6 +859,284 @@ def get_notifications():
             'message': f'Error: {str(e)}'
         }), 500
 
+# ==================== LAPORAN ENDPOINTS ====================
+
+@app.route('/api/laporan', methods=['POST'])
+def create_laporan():
+    try:
+        data = request.get_json(silent=True) or {}
+        if not isinstance(data, dict):
+            return jsonify({
+                'success': False,
+                'message': 'Body harus berupa objek JSON'
+            }), 400
+        for field in ['jenis', 'format']:
+            if field not in data:
+                return jsonify({
+                    'success': False,
+                    'message': f'Field {field} harus diisi'
+                }), 400
+        
+        try:
+            job, created = reports.submit(data['jenis'], data['format'], data)
+        except ValueError as e:
+            return jsonify({
+                'success': False,
+                'message': str(e)
+            }), 400
+        
+        return jsonify({
+            'success': True,
+            'data': job.to_dict(),
+            'message': 'Laporan siap diunduh' if job.status == 'done' else 'Laporan sedang dibuat'
+        }), 200 if job.status == 'done' else 202
+        
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({
+            'success': False,
+            'message': f'Error: {str(e)}'
+        }), 500
+
+@app.route('/api/laporan/<job_id>')
+def get_laporan(job_id):
+    job = db.session.get(ReportJob, job_id)
+    if job is None:
+        return jsonify({
+            'success': False,
+            'message': 'Laporan tidak ditemukan'
+        }), 404
+    
+    return jsonify({
+        'success': True,
+        'data': job.to_dict(),
+        'message': f'Status laporan: {job.status}'
+    })
+
+@app.route('/api/laporan/<job_id>/unduh')
+def download_laporan(job_id):
+    job = db.session.get(ReportJob, job_id)
+    if job is None:
+        return jsonify({
+            'success': False,
+            'message': 'Laporan tidak ditemukan'
+        }), 404
+    
+    path = reports.artifact_path(job.cache_key, job.format)
+    if job.status != 'done' or not os.path.exists(path):
+        return jsonify({
+            'success': False,
+            'message': f'Laporan belum tersedia (status: {job.status})'
+        }), 409
+    
+    # send_file streams the file and supports Range/conditional requests
+    return send_file(
+        path,
+        mimetype=REPORT_FORMATS[job.format],
+        as_attachment=True,
+        download_name=reports.download_name(job),
+        conditional=True,
+        etag=job.cache_key
+    )
+
+# ==================== BACKGROUND JOBS ====================
+
+scheduler = Scheduler(app, db, SchedulerLock, JobRun)
+
+@scheduler.job('*/15 * * * *')
+def refresh_statistik():
+    """Precompute statistik dashboard dan rekap notifikasi"""
+    generasi = statistik_generasi()
+    stats = compute_dashboard_stats()
+    rekap = compute_rekap_kadaluarsa()
+    if not (store_statistik('dashboard', stats, generasi) and store_statistik('kadaluarsa', rekap, generasi)):
+        return 'Data berubah saat dihitung, cache tidak disimpan'
+    return f"{stats['totalObat']} obat, {stats['pasienHariIni']} pasien hari ini"
+
+@scheduler.job('5 0 * * *')
+def rekap_kadaluarsa():
+    """Hitung ulang obat kadaluarsa setelah pergantian hari"""
+    generasi = statistik_generasi()
+    rekap = compute_rekap_kadaluarsa()
+    stats = compute_dashboard_stats()
+    if not (store_statistik('kadaluarsa', rekap, generasi) and store_statistik('dashboard', stats, generasi)):
+        return 'Data berubah saat dihitung, cache tidak disimpan'
+    return f"{len(rekap['kadaluarsa'])} kadaluarsa, {len(rekap['akanKadaluarsa'])} akan kadaluarsa"
+
+@scheduler.job('30 2 * * *')
+def optimasi_database():
+    """ANALYZE setiap malam, VACUUM setiap Minggu (SQLite)"""
+    engine = db.engine
+    if engine.dialect.name == 'sqlite':
+        vacuum = datetime.now().weekday() == 6
+        # VACUUM tidak boleh di dalam transaksi
+        with engine.connect().execution_options(isolation_level='AUTOCOMMIT') as conn:
+            conn.exec_driver_sql('ANALYZE')
+            conn.exec_driver_sql('PRAGMA optimize')
+            if vacuum:
+                conn.exec_driver_sql('VACUUM')
+        return 'ANALYZE + VACUUM' if vacuum else 'ANALYZE'
+    
+    with engine.connect().execution_options(isolation_level='AUTOCOMMIT') as conn:
+        conn.exec_driver_sql('ANALYZE')
+    return 'ANALYZE'
+
+@scheduler.job('0 1 1 * *')
+def arsipkan_kunjungan():
+    """Pindahkan kunjungan tahun ajaran lama ke arsip"""
+    if not app.config['ARCHIVE_AUTO']:
+        return 'ARCHIVE_AUTO nonaktif'
+    summary = archive.archive()
+    return ', '.join(f'{tahun}: {jumlah}' for tahun, jumlah in summary.items()) or 'Tidak ada data untuk diarsipkan'
+
+@scheduler.job('45 3 * * *')
+def bersihkan_riwayat_job():
+    """Hapus riwayat job lama"""
+    return f'{scheduler.prune_history()} riwayat dihapus'
+
+@scheduler.job('15 * * * *')
+def bersihkan_laporan():
+    """Hapus file laporan dan job yang sudah kadaluarsa"""
+    return f'{reports.prune()} file laporan dihapus'
+
+@scheduler.job('50 3 * * *')
+def bersihkan_idempotency_key():
+    """Hapus Idempotency-Key yang sudah kadaluarsa"""
+    return f'{idempotency.prune()} key dihapus'
+
+@scheduler.job(app.config['BACKUP_SCHEDULE'])
+def backup_database():
+    """Snapshot database online (SQLite backup API / pg_dump) dengan retensi"""
+    # Run manual lewat /api/admin/jobs tidak boleh menggeser snapshot terjadwal
+    label = 'auto' if scheduler.current_trigger() == 'schedule' else 'manual'
+    manifest = backups.backup(label=label)
+    return f"{manifest['file']} ({manifest['size'] // 1024} KB, {manifest['duration_ms']:.0f} ms)"
+
+def start_background():
+    """Mulai process pool laporan dan scheduler di process yang melayani request
+
+    Dipanggil dari `python app.py` dan hook `post_worker_init` di gunicorn.conf.py, bukan
+    saat import, sehingga perintah `flask --app app ...` dan skrip yang mengimpor app
+    tidak ikut menjalankan job atau mem-fork worker render.
+    """
+    reports.start()
+    if app.config['SCHEDULER_ENABLED']:
+        scheduler.start()
+
+# ==================== ADMIN ENDPOINTS ====================
+
+@app.route('/api/admin/jobs')
+def get_jobs():
+    try:
+        history = request.args.get('history', 50, type=int)
+        return jsonify({
+            'success': True,
+            'data': scheduler.status(history=history),
+            'message': 'Status job berhasil diambil'
+        })
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'message': f'Error: {str(e)}'
+        }), 500
+
+@app.route('/api/admin/throttle')
+def get_throttle_status():
+    return jsonify({
+        'success': True,
+        'data': throttle.status(),
+        'message': 'Status admission control berhasil diambil'
+    })
+
+@app.route('/api/admin/arsip')
+def get_arsip_status():
+    try:
+        return jsonify({
+            'success': True,
+            'data': archive.status(),
+            'message': 'Status arsip berhasil diambil'
+        })
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'message': f'Error: {str(e)}'
+        }), 500
+
+@app.route('/api/admin/backup')
+def get_backup_status():
+    try:
+        return jsonify({
+            'success': True,
+            'data': {
+                'engine': 'sqlite' if backups.is_sqlite else 'postgresql',
+                'schedule': app.config['BACKUP_SCHEDULE'],
+                'retention': backups.retention,
+                'backups': backups.list_backups()
+            },
+            'message': 'Daftar backup berhasil diambil'
+        })
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'message': f'Error: {str(e)}'
+        }), 500
+
+@app.route('/api/admin/jobs/<job_name>/run', methods=['POST'])
+def run_job(job_name):
+    if job_name not in scheduler.jobs:
+        return jsonify({
+            'success': False,
+            'message': f'Job {job_name} tidak ditemukan'
+        }), 404
+    
+    if not scheduler.submit(job_name, trigger='manual'):
+        return jsonify({
+            'success': False,
+            'message': f'Job {job_name} sedang berjalan'
+        }), 409
+    
+    return jsonify({
+        'success': True,
+        'message': f'Job {job_name} dijalankan'
+    }), 202
+
+# ==================== CLI COMMANDS ====================
+
+@app.cli.group('arsip')
+def arsip_cli():
+    """Kelola arsip kunjungan pasien (flask --app app arsip ...)"""
+
+@arsip_cli.command('status')
+def arsip_status():
+    """Tampilkan isi arsip per tahun ajaran"""
+    status = archive.status()
+    click.echo(f"Cutoff arsip otomatis: {status['cutoff']}")
+    click.echo(f"Kunjungan aktif (hot): {Pasien.query.count()}")
+    for arsip in status['tahunAjaran']:
+        click.echo(f"  {arsip['tahunAjaran']}: {arsip['jumlah']} kunjungan, "
+                   f"{arsip['ukuranAsli']} -> {arsip['ukuranTerkompresi']} byte")
+
+@arsip_cli.command('jalankan')
+@click.option('--sebelum', help='Arsipkan tahun ajaran yang selesai sebelum tanggal ini (YYYY-MM-DD)')
+def arsip_jalankan(sebelum):
+    """Pindahkan kunjungan tahun ajaran lama ke arsip"""
+    before = datetime.strptime(sebelum, '%Y-%m-%d').date() if sebelum else None
+    summary = archive.archive(before)
+    if not summary:
+        click.echo('Tidak ada data untuk diarsipkan')
+    for tahun, jumlah in summary.items():
+        click.echo(f'{tahun}: {jumlah} kunjungan diarsipkan')
+
+@arsip_cli.command('pulihkan')
+@click.argument('tahun', type=int)
+def arsip_pulihkan(tahun):
+    """Kembalikan tahun ajaran TAHUN (mis. 2023 untuk 2023/2024) ke tabel pasien"""
+    try:
+        jumlah = archive.restore(tahun)
+    except ArchiveError as e:
+        raise click.ClickException(str(e))
+    click.echo(f'{label_tahun_ajaran(tahun)}: {jumlah} kunjungan dipulihkan')
+
 # ==================== ERROR HANDLERS ====================
 
 @app.errorhandler(404)
@@ -425,5 +1155,6 @@ def internal_error(error):
     }), 500
 
 if __name__ == '__main__':
+    start_background()
     port = int(os.environ.get('PORT', 5000))
     app.run(debug=False, host='0.0.0.0', port=port)
\ No newline at end of file
@@ -0,0 +1,320 @@
+# Arsip hot/cold untuk data kunjungan pasien Sistem UKS Sekolah
+# Kunjungan dari tahun ajaran lama dipindah dari tabel `pasien` ke blob terkompresi
+# per tahun ajaran, sehingga query harian hanya menyentuh data tahun berjalan.
+
+import json
+import threading
+import zlib
+from collections import Counter, OrderedDict
+from datetime import date, datetime
+
+from sqlalchemy.schema import CreateIndex, CreateTable
+
+# Tahun ajaran di Indonesia dimulai bulan Juli
+SCHOOL_YEAR_START_MONTH = 7
+
+DELETE_CHUNK = 500
+
+
+class ArchiveError(Exception):
+    pass
+
+
+def tahun_ajaran(tanggal):
+    """Tahun awal tahun ajaran untuk `tanggal` (mis. 2024 untuk 2024/2025)"""
+    return tanggal.year if tanggal.month >= SCHOOL_YEAR_START_MONTH else tanggal.year - 1
+
+
+def rentang_tahun_ajaran(tahun):
+    """Tanggal pertama tahun ajaran `tahun` dan tanggal pertama tahun ajaran berikutnya"""
+    return date(tahun, SCHOOL_YEAR_START_MONTH, 1), date(tahun + 1, SCHOOL_YEAR_START_MONTH, 1)
+
+
+def label_tahun_ajaran(tahun):
+    return f'{tahun}/{tahun + 1}'
+
+
+class PasienArchive:
+    """Arsip kunjungan pasien per tahun ajaran
+
+    Setiap baris `archive_model` berisi seluruh kunjungan satu tahun ajaran sebagai
+    JSON terkompresi zlib. Blob yang sudah didekompresi disimpan di cache LRU kecil
+    dengan key (tahun, versi) sehingga query berulang ke arsip tidak mendekompresi ulang.
+    """
+
+    def __init__(self, app, db, pasien_model, archive_model):
+        self.app = app
+        self.db = db
+        self.pasien_model = pasien_model
+        self.archive_model = archive_model
+        self.keep_years = app.config.get('ARCHIVE_KEEP_SCHOOL_YEARS', 1)
+        self.cache_size = app.config.get('ARCHIVE_CACHE_YEARS', 4)
+        self._cache = OrderedDict()
+        self._cache_lock = threading.Lock()
+
+    # ---------- Horizon ----------
+
+    def cutoff(self, today=None):
+        """Kunjungan sebelum tanggal ini boleh diarsipkan"""
+        today = today or datetime.now().date()
+        tahun = tahun_ajaran(today) - (self.keep_years - 1)
+        return rentang_tahun_ajaran(tahun)[0]
+
+    def boundary(self):
+        """Tanggal pertama yang pasti tidak ada di arsip (None jika arsip kosong)"""
+        Arsip = self.archive_model
+        latest = self.db.session.query(self.db.func.max(Arsip.tahun)).scalar()
+        if latest is None:
+            return None
+        return rentang_tahun_ajaran(latest)[1]
+
+    def reaches_archive(self, dari):
+        """True jika rentang yang dimulai `dari` (None = tanpa batas) menyentuh arsip"""
+        batas = self.boundary()
+        if batas is None:
+            return False
+        return dari is None or dari < batas
+
+    # ---------- Serialisasi ----------
+
+    @staticmethod
+    def _encode(rows):
+        payload = json.dumps(rows, separators=(',', ':')).encode('utf-8')
+        return zlib.compress(payload, 9)
+
+    @staticmethod
+    def _decode(blob):
+        return json.loads(zlib.decompress(blob).decode('utf-8'))
+
+    def _load_year(self, arsip):
+        key = (arsip.tahun, arsip.versi)
+        with self._cache_lock:
+            if key in self._cache:
+                self._cache.move_to_end(key)
+                return self._cache[key]
+
+        rows = self._decode(arsip.data)
+        with self._cache_lock:
+            # Versi lama tahun yang sama tidak akan dipakai lagi
+            for old_key in [k for k in self._cache if k[0] == arsip.tahun]:
+                del self._cache[old_key]
+            self._cache[key] = rows
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return rows
+
+    # ---------- Id kunjungan ----------
+
+    def _max_archived_id(self):
+        Arsip = self.archive_model
+        return max(
+            (row['id'] for arsip in Arsip.query.all() for row in self._decode(arsip.data)),
+            default=0
+        )
+
+    def ensure_unique_ids(self):
+        """Pastikan id kunjungan yang sudah diarsipkan tidak pernah dipakai ulang
+
+        Tanpa AUTOINCREMENT SQLite memberi id = max(id) + 1, sehingga setelah arsip
+        mengosongkan tabel pasien id lama dipakai lagi dan bentrok dengan arsip.
+        Tabel lama dibangun ulang dengan AUTOINCREMENT lalu sqlite_sequence dinaikkan
+        ke id arsip tertinggi. PostgreSQL memakai sequence yang tidak pernah mundur.
+        """
+        engine = self.db.engine
+        if engine.dialect.name != 'sqlite':
+            return False
+
+        table = self.pasien_model.__table__
+        max_archived = self._max_archived_id()
+        raw = engine.raw_connection()
+        try:
+            conn = raw.driver_connection
+            previous_isolation = conn.isolation_level
+            conn.isolation_level = None
+            # IMMEDIATE: worker lain menunggu di sini, bukan di tengah migrasi
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                sql = conn.execute(
+                    "SELECT sql FROM sqlite_master WHERE type = 'table' AND name = ?", (table.name,)
+                ).fetchone()[0]
+                migrated = 'AUTOINCREMENT' not in sql.upper()
+                if migrated:
+                    columns = ', '.join(f'"{c.name}"' for c in table.columns)
+                    conn.execute(f'ALTER TABLE "{table.name}" RENAME TO "{table.name}_lama"')
+                    for (index,) in conn.execute(
+                        "SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = ? AND sql IS NOT NULL",
+                        (f'{table.name}_lama',)
+                    ).fetchall():
+                        conn.execute(f'DROP INDEX "{index}"')
+                    conn.execute(str(CreateTable(table).compile(dialect=engine.dialect)))
+                    for index in table.indexes:
+                        conn.execute(str(CreateIndex(index).compile(dialect=engine.dialect)))
+                    conn.execute(f'INSERT INTO "{table.name}" ({columns}) SELECT {columns} FROM "{table.name}_lama"')
+                    conn.execute(f'DROP TABLE "{table.name}_lama"')
+
+                seq = conn.execute('SELECT seq FROM sqlite_sequence WHERE name = ?', (table.name,)).fetchone()
+                if seq is None:
+                    conn.execute('INSERT INTO sqlite_sequence (name, seq) VALUES (?, ?)', (table.name, max_archived))
+                elif seq[0] < max_archived:
+                    conn.execute('UPDATE sqlite_sequence SET seq = ? WHERE name = ?', (max_archived, table.name))
+                conn.execute('COMMIT')
+            except Exception:
+                conn.execute('ROLLBACK')
+                raise
+            finally:
+                conn.isolation_level = previous_isolation
+        finally:
+            raw.close()
+        return migrated
+
+    # ---------- Archive / restore ----------
+
+    def archive(self, before=None):
+        """Pindahkan kunjungan sebelum `before` (default: cutoff) ke arsip per tahun ajaran"""
+        Pasien = self.pasien_model
+        Arsip = self.archive_model
+        session = self.db.session
+        before = before or self.cutoff()
+        # Hanya tahun ajaran utuh yang diarsipkan
+        before = rentang_tahun_ajaran(tahun_ajaran(before))[0]
+
+        oldest = session.query(self.db.func.min(Pasien.tanggal_kunjungan)).filter(
+            Pasien.tanggal_kunjungan < before
+        ).scalar()
+        if oldest is None:
+            return {}
+
+        summary = {}
+        for tahun in range(tahun_ajaran(oldest), tahun_ajaran(before)):
+            mulai, selesai = rentang_tahun_ajaran(tahun)
+            pasien_list = Pasien.query.filter(
+                Pasien.tanggal_kunjungan >= mulai,
+                Pasien.tanggal_kunjungan < selesai
+            ).all()
+            if not pasien_list:
+                continue
+
+            try:
+                arsip = session.get(Arsip, tahun)
+                # Baris baru ditambahkan, bukan digabung per id: setiap kunjungan hanya
+                # sekali pindah ke arsip (dihapus dari tabel pasien di transaksi yang sama)
+                rows = self._decode(arsip.data) if arsip else []
+                rows.extend(pasien.to_dict() for pasien in pasien_list)
+                ordered = sorted(rows, key=lambda r: (r['tanggal_kunjungan'], r['waktu_kunjungan'] or '', r['id']))
+
+                if arsip is None:
+                    arsip = Arsip(tahun=tahun, versi=0)
+                    session.add(arsip)
+                arsip.data = self._encode(ordered)
+                arsip.jumlah = len(ordered)
+                arsip.ukuran_asli = len(json.dumps(ordered, separators=(',', ':')))
+                arsip.versi += 1
+                arsip.updated_at = datetime.utcnow()
+
+                ids = [pasien.id for pasien in pasien_list]
+                for i in range(0, len(ids), DELETE_CHUNK):
+                    Pasien.query.filter(Pasien.id.in_(ids[i:i + DELETE_CHUNK])).delete(synchronize_session=False)
+                session.commit()
+            except Exception:
+                session.rollback()
+                raise
+            summary[label_tahun_ajaran(tahun)] = len(pasien_list)
+        return summary
+
+    def restore(self, tahun):
+        """Kembalikan seluruh kunjungan tahun ajaran `tahun` ke tabel pasien
+
+        Raise ArchiveError (arsip tidak diubah) jika ada id yang sudah dipakai kunjungan
+        lain di tabel pasien atau muncul dua kali di arsip.
+        """
+        Pasien = self.pasien_model
+        Arsip = self.archive_model
+        session = self.db.session
+
+        arsip = session.get(Arsip, tahun)
+        if arsip is None:
+            return 0
+
+        try:
+            rows = self._decode(arsip.data)
+            ids = [row['id'] for row in rows]
+            clashes = {pid for pid, jumlah in Counter(ids).items() if jumlah > 1}
+            for i in range(0, len(ids), DELETE_CHUNK):
+                clashes.update(
+                    pid for (pid,) in session.query(Pasien.id).filter(Pasien.id.in_(ids[i:i + DELETE_CHUNK]))
+                )
+            if clashes:
+                contoh = ', '.join(str(pid) for pid in sorted(clashes)[:10])
+                raise ArchiveError(
+                    f'{label_tahun_ajaran(tahun)} tidak dipulihkan: {len(clashes)} id kunjungan bentrok ({contoh})'
+                )
+            restored = [self._to_model(row) for row in rows]
+            session.add_all(restored)
+            session.delete(arsip)
+            session.commit()
+        except Exception:
+            session.rollback()
+            raise
+        return len(restored)
+
+    def _to_model(self, row):
+        return self.pasien_model(
+            id=row['id'],
+            nama=row['nama'],
+            kelas_jabatan=row['kelas_jabatan'],
+            tanggal_kunjungan=date.fromisoformat(row['tanggal_kunjungan']),
+            waktu_kunjungan=datetime.strptime(row['waktu_kunjungan'], '%H:%M').time(),
+            keluhan=row['keluhan'],
+            diagnosa=row['diagnosa'],
+            obat_diberikan=row['obat_diberikan'],
+            created_at=datetime.fromisoformat(row['created_at']) if row['created_at'] else None
+        )
+
+    # ---------- Query ----------
+
+    def query(self, dari=None, sampai=None, predicate=None):
+        """Kunjungan arsip dalam rentang [dari, sampai] yang lolos `predicate`, sebagai dict"""
+        Arsip = self.archive_model
+        q = Arsip.query
+        if dari is not None:
+            q = q.filter(Arsip.tahun >= tahun_ajaran(dari))
+        if sampai is not None:
+            q = q.filter(Arsip.tahun <= tahun_ajaran(sampai))
+
+        dari_str = dari.isoformat() if dari else None
+        sampai_str = sampai.isoformat() if sampai else None
+        result = []
+        for arsip in q.order_by(Arsip.tahun).all():
+            for row in self._load_year(arsip):
+                tanggal = row['tanggal_kunjungan']
+                if dari_str and tanggal < dari_str:
+                    continue
+                if sampai_str and tanggal > sampai_str:
+                    continue
+                if predicate is None or predicate(row):
+                    result.append(row)
+        return result
+
+    def status(self):
+        Arsip = self.archive_model
+        years = Arsip.query.order_by(Arsip.tahun).all()
+        batas = self.boundary()
+        return {
+            'cutoff': self.cutoff().isoformat(),
+            'batasArsip': batas.isoformat() if batas else None,
+            'tahunAjaran': [arsip.to_dict() for arsip in years],
+            'totalKunjungan': sum(arsip.jumlah for arsip in years)
+        }
+
+
+def contains_predicate(query, fields):
+    """Predicate pencarian case-insensitive, setara dengan LIKE '%q%' di SQLite"""
+    needle = query.lower()
+
+    def predicate(row):
+        return any(needle in (row.get(field) or '').lower() for field in fields)
+    return predicate
+
+
+def sort_kunjungan(rows, reverse=True):
+    return sorted(rows, key=lambda r: (r['tanggal_kunjungan'], r['waktu_kunjungan'] or ''), reverse=reverse)
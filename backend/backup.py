@@ -0,0 +1,391 @@
+# Backup & restore database Sistem UKS Sekolah
+# SQLite: online backup API yang disalin bertahap (beberapa page per langkah, jeda
+# di antaranya) sehingga request yang sedang menulis tidak ikut berhenti.
+# PostgreSQL (DATABASE_URL diisi): pg_dump/pg_restore format custom.
+# Modul ini tidak mengimpor app.py supaya bisa dipakai dari deploy.py.
+
+import hashlib
+import json
+import os
+import re
+import shutil
+import sqlite3
+import statistics
+import subprocess
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+
+class BackupError(Exception):
+    pass
+
+
+class _Restarted(Exception):
+    """Dipakai untuk menghentikan backup bertahap yang terus diulang dari awal"""
+
+
+def resolve_sqlite_path(uri, instance_path):
+    """Path file SQLite dari URI, relatif terhadap instance folder (sama seperti Flask-SQLAlchemy)"""
+    path = uri[len('sqlite:///'):]
+    if path in ('', ':memory:'):
+        raise BackupError('Database SQLite in-memory tidak bisa di-backup')
+    if not os.path.isabs(path):
+        path = os.path.join(instance_path, path)
+    return path
+
+
+def _sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def enable_sqlite_wal(dbapi_connection, connection_record):
+    """Listener SQLAlchemy 'connect': WAL agar pembaca (termasuk backup) tidak memblokir writer"""
+    cursor = dbapi_connection.cursor()
+    cursor.execute('PRAGMA journal_mode=WAL')
+    cursor.close()
+
+
+def sqlite_online_backup(source_path, dest_path, pages=256, sleep=0.01, max_restarts=3):
+    """Salin database SQLite yang sedang dipakai ke `dest_path` secara bertahap
+
+    Setiap langkah menyalin `pages` page lalu tidur `sleep` detik (GIL dan I/O dilepas
+    untuk thread request). Pada mode WAL koneksi sumber menahan satu snapshot baca
+    sehingga hasilnya konsisten tanpa restart dan writer tetap jalan. Pada mode journal
+    lain SQLite mengulang backup dari awal setiap kali ada write; setelah
+    `max_restarts` kali backup dijalankan dalam satu langkah supaya tetap selesai.
+    """
+    state = {'remaining': None, 'restarts': 0, 'steps': 0}
+
+    def progress(status, remaining, total):
+        state['steps'] += 1
+        if state['remaining'] is not None and remaining > state['remaining']:
+            state['restarts'] += 1
+            if state['restarts'] > max_restarts:
+                raise _Restarted()
+        state['remaining'] = remaining
+        if remaining and sleep:
+            time.sleep(sleep)
+
+    tmp_path = f'{dest_path}.tmp'
+    source = sqlite3.connect(source_path, timeout=30, isolation_level=None)
+    try:
+        journal_mode = source.execute('PRAGMA journal_mode').fetchone()[0].lower()
+        if journal_mode == 'wal':
+            source.execute('BEGIN')
+            source.execute('SELECT COUNT(*) FROM sqlite_master').fetchone()
+        dest = sqlite3.connect(tmp_path)
+        try:
+            try:
+                source.backup(dest, pages=pages, progress=progress)
+                mode = 'stepped' if pages > 0 else 'single-step'
+            except _Restarted:
+                source.backup(dest, pages=-1)
+                mode = 'single-step'
+            # Backup sebaiknya berdiri sendiri (tanpa file -wal)
+            dest.execute('PRAGMA journal_mode=DELETE')
+        finally:
+            dest.close()
+        if source.in_transaction:
+            source.execute('COMMIT')
+    finally:
+        source.close()
+    os.replace(tmp_path, dest_path)
+    return {'mode': mode, 'journal_mode': journal_mode, 'steps': state['steps'], 'restarts': state['restarts']}
+
+
+def verify_sqlite(path):
+    """Cek integritas file SQLite dan hitung baris per tabel"""
+    conn = sqlite3.connect(f'file:{path}?mode=ro', uri=True)
+    try:
+        result = conn.execute('PRAGMA integrity_check').fetchone()[0]
+        tables = [row[0] for row in conn.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'table' AND name NOT LIKE 'sqlite_%' ORDER BY name"
+        )]
+        counts = {table: conn.execute(f'SELECT COUNT(*) FROM "{table}"').fetchone()[0] for table in tables}
+    finally:
+        conn.close()
+    return {'ok': result == 'ok', 'integrity': result, 'tables': counts}
+
+
+class BackupManager:
+    """Snapshot database ke BACKUP_DIR dengan manifest JSON dan retensi
+
+    Setiap snapshot terdiri dari file data (`.db` untuk SQLite, `.dump` untuk
+    PostgreSQL) dan `.json` berisi waktu, ukuran, sha256 dan hasil verifikasi.
+    """
+
+    def __init__(self, database_uri, backup_dir, instance_path, keep=14, keep_manual=5, keep_pre_restore=3,
+                 pages=256, sleep=0.01):
+        self.database_uri = database_uri
+        self.backup_dir = os.path.abspath(backup_dir)
+        self.instance_path = instance_path
+        self.keep = keep
+        # Retensi dihitung per label supaya backup manual tidak menggeser snapshot terjadwal
+        self.retention = {'auto': keep, 'manual': keep_manual, 'pre-restore': keep_pre_restore}
+        self.pages = pages
+        self.sleep = sleep
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, config, instance_path):
+        return cls(
+            config['SQLALCHEMY_DATABASE_URI'],
+            config['BACKUP_DIR'],
+            instance_path,
+            keep=config['BACKUP_KEEP'],
+            keep_manual=config['BACKUP_KEEP_MANUAL'],
+            keep_pre_restore=config['BACKUP_KEEP_PRE_RESTORE'],
+            pages=config['BACKUP_PAGES_PER_STEP'],
+            sleep=config['BACKUP_STEP_SLEEP_MS'] / 1000.0
+        )
+
+    @property
+    def is_sqlite(self):
+        return self.database_uri.startswith('sqlite:')
+
+    @property
+    def extension(self):
+        return 'db' if self.is_sqlite else 'dump'
+
+    # ---------- Backup ----------
+
+    def backup(self, label='auto', prune=True):
+        """Buat snapshot baru, verifikasi, tulis manifest lalu terapkan retensi
+
+        `label`: 'auto' (terjadwal), 'manual' atau 'pre-restore'; masing-masing punya retensi sendiri.
+        """
+        if label not in self.retention:
+            raise BackupError(f'Label backup tidak dikenal: {label}')
+        if not self._lock.acquire(blocking=False):
+            raise BackupError('Backup lain sedang berjalan')
+        try:
+            os.makedirs(self.backup_dir, exist_ok=True)
+            stamp = datetime.now().strftime('%Y%m%d-%H%M%S')
+            name = f'uks-{stamp}-{label}'
+            counter = 1
+            while os.path.exists(os.path.join(self.backup_dir, f'{name}.json')):
+                counter += 1
+                name = f'uks-{stamp}-{label}-{counter}'
+            path = os.path.join(self.backup_dir, f'{name}.{self.extension}')
+
+            start = time.perf_counter()
+            if self.is_sqlite:
+                source = resolve_sqlite_path(self.database_uri, self.instance_path)
+                if not os.path.exists(source):
+                    raise BackupError(f'File database tidak ditemukan: {source}')
+                details = sqlite_online_backup(source, path, pages=self.pages, sleep=self.sleep)
+            else:
+                details = self._pg_dump(path)
+            duration_ms = (time.perf_counter() - start) * 1000
+
+            verification = self.verify(path)
+            if not verification['ok']:
+                os.remove(path)
+                raise BackupError(f"Verifikasi backup gagal: {verification.get('integrity')}")
+
+            manifest = {
+                'name': name,
+                'label': label,
+                'file': os.path.basename(path),
+                'engine': 'sqlite' if self.is_sqlite else 'postgresql',
+                'created_at': datetime.now().isoformat(),
+                'size': os.path.getsize(path),
+                'sha256': _sha256(path),
+                'duration_ms': round(duration_ms, 2),
+                'details': details,
+                'verification': verification
+            }
+            with open(os.path.join(self.backup_dir, f'{name}.json'), 'w') as f:
+                json.dump(manifest, f, indent=2)
+
+            if prune:
+                self.apply_retention()
+            return manifest
+        finally:
+            self._lock.release()
+
+    def _pg_dump(self, path):
+        if shutil.which('pg_dump') is None:
+            raise BackupError('pg_dump tidak ditemukan, install postgresql-client')
+        tmp_path = f'{path}.tmp'
+        subprocess.run(
+            ['pg_dump', '--format=custom', '--no-owner', '--file', tmp_path, self.database_uri],
+            check=True, capture_output=True, text=True
+        )
+        os.replace(tmp_path, path)
+        return {'mode': 'pg_dump'}
+
+    # ---------- Verify & list ----------
+
+    def verify(self, path):
+        if path.endswith('.db'):
+            return verify_sqlite(path)
+        if shutil.which('pg_restore') is None:
+            raise BackupError('pg_restore tidak ditemukan, install postgresql-client')
+        result = subprocess.run(['pg_restore', '--list', path], capture_output=True, text=True)
+        entries = [line for line in result.stdout.splitlines() if line and not line.startswith(';')]
+        return {
+            'ok': result.returncode == 0,
+            'integrity': 'ok' if result.returncode == 0 else result.stderr.strip(),
+            'entries': len(entries)
+        }
+
+    def list_backups(self):
+        if not os.path.isdir(self.backup_dir):
+            return []
+        manifests = []
+        for name in os.listdir(self.backup_dir):
+            if name.endswith('.json'):
+                with open(os.path.join(self.backup_dir, name)) as f:
+                    manifests.append(json.load(f))
+        return sorted(manifests, key=lambda m: m['created_at'], reverse=True)
+
+    def resolve(self, name_or_path):
+        """Terima path file backup atau nama snapshot dari list_backups()"""
+        if os.path.exists(name_or_path):
+            return os.path.abspath(name_or_path)
+        for candidate in (name_or_path, f'{name_or_path}.{self.extension}'):
+            path = os.path.join(self.backup_dir, candidate)
+            if os.path.exists(path):
+                return path
+        raise BackupError(f'Backup tidak ditemukan: {name_or_path}')
+
+    @staticmethod
+    def _label(manifest):
+        if 'label' in manifest:
+            return manifest['label']
+        # Manifest lama tanpa field label: uks-YYYYmmdd-HHMMSS-<label>[-n]
+        label = manifest['name'].split('-', 3)[3]
+        return re.sub(r'-\d+$', '', label)
+
+    def apply_retention(self):
+        """Simpan snapshot terbaru per label sesuai batas retensinya"""
+        removed = []
+        seen = {}
+        for manifest in self.list_backups():
+            label = self._label(manifest)
+            seen[label] = seen.get(label, 0) + 1
+            if seen[label] <= self.retention.get(label, self.keep):
+                continue
+            for filename in (manifest['file'], f"{manifest['name']}.json"):
+                path = os.path.join(self.backup_dir, filename)
+                if os.path.exists(path):
+                    os.remove(path)
+            removed.append(manifest['name'])
+        return removed
+
+    # ---------- Restore ----------
+
+    def restore(self, name_or_path):
+        """Pulihkan database dari backup; database saat ini disimpan dulu sebagai pre-restore"""
+        path = self.resolve(name_or_path)
+        verification = self.verify(path)
+        if not verification['ok']:
+            raise BackupError(f"Backup rusak, restore dibatalkan: {verification.get('integrity')}")
+
+        safety = None
+        if self.is_sqlite:
+            target = resolve_sqlite_path(self.database_uri, self.instance_path)
+            if os.path.exists(target):
+                safety = self.backup(label='pre-restore', prune=False)['file']
+            source = sqlite3.connect(f'file:{path}?mode=ro', uri=True)
+            dest = sqlite3.connect(target, timeout=30)
+            try:
+                # Satu langkah: database hasil restore tidak pernah setengah jadi
+                source.backup(dest, pages=-1)
+            finally:
+                dest.close()
+                source.close()
+            result = verify_sqlite(target)
+        else:
+            safety = self.backup(label='pre-restore', prune=False)['file']
+            subprocess.run(
+                ['pg_restore', '--clean', '--if-exists', '--no-owner', '--dbname', self.database_uri, path],
+                check=True, capture_output=True, text=True
+            )
+            result = {'ok': True}
+        # Retensi baru dijalankan setelah restore supaya sumber restore tidak ikut terhapus
+        self.apply_retention()
+        return {'restored_from': os.path.basename(path), 'safety_backup': safety, 'verification': result}
+
+
+# ==================== BENCHMARK ====================
+
+def benchmark_write_latency(rows=200000, writes_per_second=50, pages=256, sleep=0.01):
+    """Ukur latensi commit writer saat idle, saat backup satu langkah dan saat backup bertahap
+
+    Untuk mode journal DELETE (default SQLite) dan WAL dibuat database sementara berisi
+    `rows` baris, lalu satu thread menulis dengan laju tetap selama tiap skenario.
+    Return dict journal_mode -> skenario -> statistik (ms).
+    """
+    tmpdir = tempfile.mkdtemp(prefix='uks-backup-bench-')
+
+    def create_source(journal_mode):
+        source = os.path.join(tmpdir, f'source-{journal_mode}.db')
+        conn = sqlite3.connect(source)
+        conn.execute(f'PRAGMA journal_mode={journal_mode}')
+        conn.execute('CREATE TABLE pasien (id INTEGER PRIMARY KEY, nama TEXT, keluhan TEXT, created_at TEXT)')
+        conn.executemany(
+            'INSERT INTO pasien (nama, keluhan, created_at) VALUES (?, ?, ?)',
+            ((f'Siswa {i}', 'pusing ' * 20, datetime.now().isoformat()) for i in range(rows))
+        )
+        conn.commit()
+        conn.close()
+        return source
+
+    def run_scenario(source, backup_fn):
+        latencies, stop = [], threading.Event()
+
+        def writer():
+            wconn = sqlite3.connect(source, timeout=30)
+            interval = 1.0 / writes_per_second
+            while not stop.is_set():
+                start = time.perf_counter()
+                wconn.execute('INSERT INTO pasien (nama, keluhan, created_at) VALUES (?, ?, ?)',
+                              ('bench', 'demam', datetime.now().isoformat()))
+                wconn.commit()
+                elapsed = time.perf_counter() - start
+                latencies.append(elapsed * 1000)
+                time.sleep(max(0, interval - elapsed))
+            wconn.close()
+
+        thread = threading.Thread(target=writer)
+        thread.start()
+        time.sleep(0.3)
+        start = time.perf_counter()
+        details = backup_fn()
+        backup_ms = (time.perf_counter() - start) * 1000
+        time.sleep(0.3)
+        stop.set()
+        thread.join()
+
+        latencies.sort()
+        return {
+            'backup_ms': round(backup_ms, 1),
+            'writes': len(latencies),
+            'p50_ms': round(statistics.median(latencies), 2),
+            'p99_ms': round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))], 2),
+            'max_ms': round(latencies[-1], 2),
+            'details': details
+        }
+
+    results = {}
+    try:
+        for journal_mode in ('delete', 'wal'):
+            source = create_source(journal_mode)
+            dest = os.path.join(tmpdir, 'backup.db')
+            results[journal_mode] = {
+                'size_mb': round(os.path.getsize(source) / (1024 * 1024), 1),
+                'idle': run_scenario(source, lambda: time.sleep(1.0)),
+                'single-step': run_scenario(source, lambda: sqlite_online_backup(source, dest, pages=-1)),
+                'stepped': run_scenario(source, lambda: sqlite_online_backup(source, dest, pages=pages, sleep=sleep))
+            }
+    finally:
+        shutil.rmtree(tmpdir, ignore_errors=True)
+    return results
@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+Benchmark latensi hot-path sebelum dan sesudah pengarsipan kunjungan
+Membuat database SQLite sementara berisi data sintetis beberapa tahun ajaran,
+mengukur endpoint pasien/dashboard, mengarsipkan tahun lama lalu mengukur ulang.
+
+Usage: python benchmark_arsip.py [--tahun 5] [--per-hari 40] [--ulang 20]
+"""
+
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, time as dtime, timedelta
+
+ENDPOINTS = [
+    ('GET /api/pasien', '/api/pasien'),
+    ('GET /api/pasien/search', '/api/pasien/search?q=pusing'),
+    ('GET /api/pasien/harian', '/api/pasien/harian'),
+    ('GET /api/dashboard/stats', '/api/dashboard/stats'),
+]
+
+
+def seed(app_module, years, per_day):
+    """Isi tabel pasien dengan kunjungan sintetis hari sekolah selama `years` tahun"""
+    db, Pasien = app_module.db, app_module.Pasien
+    keluhan = ['pusing', 'demam', 'sakit perut', 'luka ringan', 'mual', 'batuk']
+    kelas = [f'Kelas {t}{k}' for t in (7, 8, 9) for k in 'ABCD'] + ['Guru', 'Staff TU']
+    rng = random.Random(42)
+
+    today = datetime.now().date()
+    day = today - timedelta(days=365 * years)
+    batch = []
+    while day <= today:
+        if day.weekday() < 5:
+            for _ in range(rng.randint(per_day // 2, per_day)):
+                batch.append(Pasien(
+                    nama=f'Siswa {rng.randint(1, 900)}',
+                    kelas_jabatan=rng.choice(kelas),
+                    tanggal_kunjungan=day,
+                    waktu_kunjungan=dtime(rng.randint(7, 14), rng.randint(0, 59)),
+                    keluhan=rng.choice(keluhan),
+                    diagnosa='observasi',
+                    obat_diberikan='paracetamol'
+                ))
+        if len(batch) >= 5000:
+            db.session.add_all(batch)
+            db.session.commit()
+            batch = []
+        day += timedelta(days=1)
+    db.session.add_all(batch)
+    db.session.commit()
+
+
+def measure(client, repeat):
+    results = {}
+    for label, url in ENDPOINTS:
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            response = client.get(url)
+            timings.append((time.perf_counter() - start) * 1000)
+            assert response.status_code == 200, (url, response.status_code)
+        results[label] = (statistics.median(timings), len(response.get_json()['data']))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--tahun', type=int, default=5, help='Jumlah tahun data sintetis')
+    parser.add_argument('--per-hari', type=int, default=40, help='Maksimum kunjungan per hari sekolah')
+    parser.add_argument('--ulang', type=int, default=20, help='Jumlah pengulangan per endpoint')
+    args = parser.parse_args()
+
+    tmpdir = tempfile.mkdtemp(prefix='uks-bench-')
+    os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(tmpdir, 'bench.db')}"
+    os.environ['RATE_LIMIT_PER_MINUTE'] = '0'
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    import app as app_module
+
+    app = app_module.app
+    client = app.test_client()
+    with app.app_context():
+        print(f'📦 Membuat data sintetis {args.tahun} tahun...')
+        seed(app_module, args.tahun, args.per_hari)
+        total = app_module.Pasien.query.count()
+        print(f'   {total} kunjungan di tabel pasien')
+
+        before = measure(client, args.ulang)
+        start = time.perf_counter()
+        summary = app_module.archive.archive()
+        archive_ms = (time.perf_counter() - start) * 1000
+        hot = app_module.Pasien.query.count()
+        print(f'🗄️  Arsip: {sum(summary.values())} kunjungan dari {len(summary)} tahun ajaran '
+              f'dalam {archive_ms:.0f} ms, sisa {hot} di tabel aktif')
+        after = measure(client, args.ulang)
+
+    print(f"\n{'Endpoint':<28}{'Sebelum (ms)':>14}{'Sesudah (ms)':>14}{'Baris':>16}")
+    for label, _ in ENDPOINTS:
+        (ms_before, rows_before), (ms_after, rows_after) = before[label], after[label]
+        print(f'{label:<28}{ms_before:>14.1f}{ms_after:>14.1f}{f"{rows_before} -> {rows_after}":>16}')
+    print(f'\nDatabase sementara: {tmpdir}')
+
+
+if __name__ == '__main__':
+    main()
@@ -16,4 +16,52 @@ class Config:
     
     # Fallback to SQLite if no PostgreSQL available
     SQLALCHEMY_DATABASE_URI = database_url or 'sqlite:///uks_sekolah.db'
-    SQLALCHEMY_TRACK_MODIFICATIONS = False
\ No newline at end of file
+    SQLALCHEMY_TRACK_MODIFICATIONS = False
+    
+    # Background scheduler (job pemeliharaan & precompute)
+    SCHEDULER_ENABLED = os.environ.get('SCHEDULER_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+    SCHEDULER_WORKERS = int(os.environ.get('SCHEDULER_WORKERS', 2))
+    SCHEDULER_LOCK_TTL = int(os.environ.get('SCHEDULER_LOCK_TTL', 90))
+    SCHEDULER_HISTORY_LIMIT = int(os.environ.get('SCHEDULER_HISTORY_LIMIT', 500))
+    
+    # Admission control: rate limit per klien dan batas concurrency endpoint berat
+    # Satu sekolah sering berbagi satu IP publik (NAT), jadi batas berlaku per sekolah
+    # dan default dibuat longgar
+    RATE_LIMIT_PER_MINUTE = int(os.environ.get('RATE_LIMIT_PER_MINUTE', 300))
+    RATE_LIMIT_BURST = int(os.environ.get('RATE_LIMIT_BURST', 100))
+    RATE_LIMIT_EXEMPT = ('/api/health',)
+    HEAVY_CONCURRENCY_LIMIT = int(os.environ.get('HEAVY_CONCURRENCY_LIMIT', 4))
+    HEAVY_QUEUE_TIMEOUT = float(os.environ.get('HEAVY_QUEUE_TIMEOUT', 0.5))
+    HEAVY_RETRY_AFTER = int(os.environ.get('HEAVY_RETRY_AFTER', 2))
+    # Batas tunggu request yang digabung ke komputasi request lain (query lambat/macet)
+    COALESCE_TIMEOUT = float(os.environ.get('COALESCE_TIMEOUT', 10))
+    # Jumlah reverse proxy tepercaya di depan app (Render/Railway/Vercel: 1, akses langsung: 0)
+    TRUSTED_PROXY_HOPS = int(os.environ.get('TRUSTED_PROXY_HOPS', 1))
+    
+    # Arsip kunjungan: jumlah tahun ajaran yang tetap di tabel aktif
+    ARCHIVE_AUTO = os.environ.get('ARCHIVE_AUTO', 'true').lower() in ('1', 'true', 'yes')
+    ARCHIVE_KEEP_SCHOOL_YEARS = int(os.environ.get('ARCHIVE_KEEP_SCHOOL_YEARS', 2))
+    ARCHIVE_CACHE_YEARS = int(os.environ.get('ARCHIVE_CACHE_YEARS', 4))
+    
+    # Lama Idempotency-Key disimpan; harus lebih lama dari antrian offline di browser
+    IDEMPOTENCY_TTL_HOURS = int(os.environ.get('IDEMPOTENCY_TTL_HOURS', 168))
+    # Key tanpa response tersimpan setelah selang ini dianggap sudah diterapkan
+    IDEMPOTENCY_PENDING_SECONDS = int(os.environ.get('IDEMPOTENCY_PENDING_SECONDS', 30))
+    
+    # Laporan asinkron: lokasi file hasil dan ukuran pool
+    REPORT_DIR = os.environ.get('REPORT_DIR') or os.path.join(os.path.dirname(os.path.abspath(__file__)), 'instance', 'laporan')
+    REPORT_TTL_HOURS = int(os.environ.get('REPORT_TTL_HOURS', 24))
+    REPORT_PROCESSES = int(os.environ.get('REPORT_PROCESSES', 2))
+    REPORT_THREADS = int(os.environ.get('REPORT_THREADS', 2))
+    REPORT_JOB_TIMEOUT_MINUTES = int(os.environ.get('REPORT_JOB_TIMEOUT_MINUTES', 10))
+    
+    # Backup database: snapshot online terjadwal dan retensi
+    # WAL membuat backup bertahap tidak memblokir writer dan tidak restart dari awal
+    SQLITE_WAL = os.environ.get('SQLITE_WAL', 'true').lower() in ('1', 'true', 'yes')
+    BACKUP_DIR = os.environ.get('BACKUP_DIR') or os.path.join(os.path.dirname(os.path.abspath(__file__)), 'instance', 'backup')
+    BACKUP_SCHEDULE = os.environ.get('BACKUP_SCHEDULE', '0 23 * * *')
+    BACKUP_KEEP = int(os.environ.get('BACKUP_KEEP', 14))
+    BACKUP_KEEP_MANUAL = int(os.environ.get('BACKUP_KEEP_MANUAL', 5))
+    BACKUP_KEEP_PRE_RESTORE = int(os.environ.get('BACKUP_KEEP_PRE_RESTORE', 3))
+    BACKUP_PAGES_PER_STEP = int(os.environ.get('BACKUP_PAGES_PER_STEP', 256))
+    BACKUP_STEP_SLEEP_MS = int(os.environ.get('BACKUP_STEP_SLEEP_MS', 10))
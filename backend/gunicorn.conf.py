@@ -0,0 +1,8 @@
+# Konfigurasi gunicorn Sistem UKS Sekolah
+# Dibaca otomatis saat gunicorn dijalankan dari direktori backend.
+
+
+def post_worker_init(worker):
+    """Mulai scheduler dan process pool laporan di worker, setelah app dimuat"""
+    from app import start_background
+    start_background()
@@ -0,0 +1,104 @@
+# Idempotency-Key untuk endpoint write Sistem UKS Sekolah
+# Client offline memutar ulang antrian write saat koneksi kembali; key yang sama
+# tidak boleh menghasilkan kunjungan atau perubahan ganda.
+
+from datetime import datetime, timedelta
+from functools import wraps
+
+from flask import current_app, jsonify, make_response, request
+
+HEADER = 'Idempotency-Key'
+MAX_KEY_LENGTH = 100
+
+
+class Idempotency:
+    """Simpan response write sukses per Idempotency-Key dan putar ulang untuk retry
+
+    Baris key ditambahkan ke session sebelum view dijalankan sehingga ikut ter-commit
+    bersama perubahan data di dalam view. Response baru disimpan di commit kedua; jika
+    commit itu tidak terjadi (proses mati, database sibuk), baris key tanpa status_code
+    tetap menandakan write sudah diterapkan. Setelah IDEMPOTENCY_PENDING_SECONDS key
+    seperti itu dijawab 200 tanpa data, bukan 409, agar antrian offline tidak macet.
+    """
+
+    def __init__(self, app, db, key_model):
+        self.app = app
+        self.db = db
+        self.key_model = key_model
+        self.ttl = timedelta(hours=app.config.get('IDEMPOTENCY_TTL_HOURS', 168))
+        self.pending = timedelta(seconds=app.config.get('IDEMPOTENCY_PENDING_SECONDS', 30))
+
+    def _replay(self, record):
+        if record.method != request.method or record.path != request.path:
+            return self._error(f'{HEADER} sudah dipakai untuk request lain', 422)
+        if record.status_code is None:
+            if record.created_at is None or datetime.utcnow() - record.created_at < self.pending:
+                response = self._error('Request dengan key ini sedang diproses', 409)
+                response.headers['Retry-After'] = '1'
+                return response
+            # Data sudah ter-commit bersama key tetapi response tidak sempat disimpan
+            response = jsonify({
+                'success': True,
+                'data': None,
+                'message': 'Request dengan key ini sudah diproses'
+            })
+        else:
+            response = current_app.response_class(
+                record.response_body, status=record.status_code, mimetype='application/json'
+            )
+        response.headers['Idempotent-Replayed'] = 'true'
+        return response
+
+    @staticmethod
+    def _error(message, status):
+        response = jsonify({
+            'success': False,
+            'message': message
+        })
+        response.status_code = status
+        return response
+
+    def idempotent(self, view):
+        """Decorator untuk endpoint POST/PUT yang menerima header Idempotency-Key"""
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            key = request.headers.get(HEADER)
+            if not key:
+                return view(*args, **kwargs)
+            if len(key) > MAX_KEY_LENGTH:
+                return self._error(f'{HEADER} maksimal {MAX_KEY_LENGTH} karakter', 400)
+
+            Key = self.key_model
+            session = self.db.session
+            record = session.get(Key, key)
+            if record is not None:
+                return self._replay(record)
+
+            record = Key(key=key, method=request.method, path=request.path)
+            session.add(record)
+            response = make_response(view(*args, **kwargs))
+
+            if response.status_code >= 300:
+                # Write gagal: jangan simpan key, retry boleh dicoba lagi.
+                # Jika gagal karena key sudah di-commit request paralel, putar ulang hasilnya.
+                session.rollback()
+                existing = session.get(Key, key)
+                return self._replay(existing) if existing is not None else response
+
+            try:
+                record.status_code = response.status_code
+                record.response_body = response.get_data(as_text=True)
+                session.commit()
+            except Exception:
+                session.rollback()
+            return response
+        return wrapper
+
+    def prune(self):
+        """Hapus key yang lebih tua dari IDEMPOTENCY_TTL_HOURS"""
+        Key = self.key_model
+        deleted = Key.query.filter(
+            Key.created_at < datetime.utcnow() - self.ttl
+        ).delete(synchronize_session=False)
+        self.db.session.commit()
+        return deleted
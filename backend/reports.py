@@ -0,0 +1,428 @@
+# Laporan asinkron untuk Sistem UKS Sekolah
+# Laporan (kunjungan harian/bulanan, inventaris, kadaluarsa) dibuat di luar request
+# thread: data dikumpulkan di thread koordinator lalu dirender ke CSV/XLSX/PDF di
+# process pool. File hasil disimpan dengan nama hash parameter + versi data, sehingga
+# request berikutnya dengan data yang sama langsung memakai file yang sudah ada.
+
+import csv
+import hashlib
+import io
+import json
+import logging
+import multiprocessing
+import os
+import tempfile
+import threading
+import time
+import uuid
+import zipfile
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime, timedelta
+from xml.sax.saxutils import escape
+
+logger = logging.getLogger(__name__)
+
+FORMATS = {
+    'csv': 'text/csv',
+    'xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+    'pdf': 'application/pdf'
+}
+
+
+# ==================== RENDERERS ====================
+# Fungsi render harus bisa dipanggil di process lain: hanya menerima data biasa
+# (list/dict/str) dan tidak menyentuh Flask maupun database.
+
+def render_csv(path, title, columns, rows):
+    with open(path, 'w', newline='', encoding='utf-8-sig') as f:
+        writer = csv.writer(f)
+        writer.writerow([label for _, label, _ in columns])
+        for row in rows:
+            writer.writerow([_cell(row, key) for key, _, _ in columns])
+
+
+def _cell(row, key):
+    value = row.get(key)
+    return '' if value is None else value
+
+
+def _column_name(index):
+    name = ''
+    index += 1
+    while index:
+        index, rem = divmod(index - 1, 26)
+        name = chr(65 + rem) + name
+    return name
+
+
+def render_xlsx(path, title, columns, rows):
+    """XLSX minimal (satu sheet, inline string) tanpa dependensi tambahan"""
+    def cell_xml(ref, value):
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            return f'<c r="{ref}"><v>{value}</v></c>'
+        text = escape(str(value))
+        return f'<c r="{ref}" t="inlineStr"><is><t xml:space="preserve">{text}</t></is></c>'
+
+    sheet_rows = []
+    all_rows = [[title]] + [[]] + [[label for _, label, _ in columns]] + [
+        [_cell(row, key) for key, _, _ in columns] for row in rows
+    ]
+    for r, values in enumerate(all_rows, start=1):
+        cells = ''.join(
+            cell_xml(f'{_column_name(c)}{r}', value)
+            for c, value in enumerate(values) if value != ''
+        )
+        sheet_rows.append(f'<row r="{r}">{cells}</row>')
+
+    cols = ''.join(
+        f'<col min="{i}" max="{i}" width="{width * 1.6:.1f}" customWidth="1"/>'
+        for i, (_, _, width) in enumerate(columns, start=1)
+    )
+    sheet = (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+        f'<cols>{cols}</cols><sheetData>{"".join(sheet_rows)}</sheetData></worksheet>'
+    )
+    files = {
+        '[Content_Types].xml': (
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+            '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+            '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+            '<Default Extension="xml" ContentType="application/xml"/>'
+            '<Override PartName="/xl/workbook.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+            '<Override PartName="/xl/worksheets/sheet1.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+            '</Types>'
+        ),
+        '_rels/.rels': (
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+            '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+            '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" Target="xl/workbook.xml"/>'
+            '</Relationships>'
+        ),
+        'xl/workbook.xml': (
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+            '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+            'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+            '<sheets><sheet name="Laporan" sheetId="1" r:id="rId1"/></sheets></workbook>'
+        ),
+        'xl/_rels/workbook.xml.rels': (
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+            '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+            '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" Target="worksheets/sheet1.xml"/>'
+            '</Relationships>'
+        ),
+        'xl/worksheets/sheet1.xml': sheet
+    }
+    with zipfile.ZipFile(path, 'w', zipfile.ZIP_DEFLATED) as zf:
+        for name, content in files.items():
+            zf.writestr(name, content)
+
+
+def _pdf_text(value):
+    text = str(value).encode('cp1252', 'replace').decode('latin-1')
+    return text.replace('\\', '\\\\').replace('(', '\\(').replace(')', '\\)')
+
+
+def render_pdf(path, title, columns, rows):
+    """PDF tabel sederhana (A4 landscape, Helvetica) tanpa dependensi tambahan"""
+    page_width, page_height = 842, 595
+    margin, font_size, line_height = 36, 8, 12
+    usable = page_width - 2 * margin
+    total_width = sum(width for _, _, width in columns)
+    widths = [usable * width / total_width for _, _, width in columns]
+    # Perkiraan lebar rata-rata karakter Helvetica
+    max_chars = [max(1, int(w / (font_size * 0.5)) - 1) for w in widths]
+
+    def fit(value, limit):
+        text = '' if value is None else str(value).replace('\n', ' ')
+        return text if len(text) <= limit else text[:limit - 1] + '~'
+
+    def line(y, values, bold=False):
+        font = '/F2' if bold else '/F1'
+        parts, x = [], margin
+        for value, width, limit in zip(values, widths, max_chars):
+            parts.append(f'BT {font} {font_size} Tf {x:.1f} {y} Td ({_pdf_text(fit(value, limit))}) Tj ET')
+            x += width
+        return '\n'.join(parts)
+
+    header = [label for _, label, _ in columns]
+    rows_per_page = int((page_height - 2 * margin - 40) / line_height)
+    chunks = [rows[i:i + rows_per_page] for i in range(0, len(rows), rows_per_page)] or [[]]
+    generated = datetime.now().strftime('%d-%m-%Y %H:%M')
+
+    streams = []
+    for number, chunk in enumerate(chunks, start=1):
+        y = page_height - margin
+        ops = [f'BT /F2 12 Tf {margin} {y} Td ({_pdf_text(title)}) Tj ET']
+        ops.append(f'BT /F1 7 Tf {margin} {margin - 16} Td '
+                   f'({_pdf_text(f"Dibuat {generated} - halaman {number}/{len(chunks)}")}) Tj ET')
+        y -= 28
+        ops.append(line(y, header, bold=True))
+        ops.append(f'{margin} {y - 3} m {page_width - margin} {y - 3} l S')
+        for row in chunk:
+            y -= line_height
+            ops.append(line(y, [row.get(key) for key, _, _ in columns]))
+        streams.append('\n'.join(ops).encode('latin-1'))
+
+    # Objek: 1 catalog, 2 pages, 3-4 font, lalu (page, content) per halaman
+    objects = [None, None,
+               b'<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>',
+               b'<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica-Bold /Encoding /WinAnsiEncoding >>']
+    kids = []
+    for stream in streams:
+        page_id, content_id = len(objects) + 1, len(objects) + 2
+        kids.append(f'{page_id} 0 R')
+        objects.append(
+            f'<< /Type /Page /Parent 2 0 R /MediaBox [0 0 {page_width} {page_height}] '
+            f'/Resources << /Font << /F1 3 0 R /F2 4 0 R >> >> /Contents {content_id} 0 R >>'.encode()
+        )
+        objects.append(b'<< /Length %d >>\nstream\n' % len(stream) + stream + b'\nendstream')
+    objects[0] = b'<< /Type /Catalog /Pages 2 0 R >>'
+    objects[1] = f'<< /Type /Pages /Kids [{" ".join(kids)}] /Count {len(kids)} >>'.encode()
+
+    out = io.BytesIO()
+    out.write(b'%PDF-1.4\n')
+    offsets = []
+    for i, obj in enumerate(objects, start=1):
+        offsets.append(out.tell())
+        out.write(b'%d 0 obj\n' % i + obj + b'\nendobj\n')
+    xref = out.tell()
+    out.write(b'xref\n0 %d\n0000000000 65535 f \n' % (len(objects) + 1))
+    for offset in offsets:
+        out.write(b'%010d 00000 n \n' % offset)
+    out.write(b'trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n' % (len(objects) + 1, xref))
+
+    with open(path, 'wb') as f:
+        f.write(out.getvalue())
+
+
+RENDERERS = {
+    'csv': render_csv,
+    'xlsx': render_xlsx,
+    'pdf': render_pdf
+}
+
+
+def render_report(fmt, path, title, columns, rows):
+    """Entry point process pool: render ke file sementara lalu rename atomik"""
+    # Nama unik per pemanggilan: render di thread (tanpa pool) berbagi pid yang sama
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+    os.close(fd)
+    try:
+        RENDERERS[fmt](tmp_path, title, columns, rows)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+    return os.path.getsize(path)
+
+
+# ==================== REPORT MANAGER ====================
+
+class ReportType:
+    """Definisi jenis laporan
+
+    `collect(params)` mengembalikan (judul, rows) dan `version(params)` mengembalikan
+    nilai yang berubah setiap kali data sumber laporan berubah. Keduanya dipanggil
+    di dalam app context. `columns` adalah list (key, label, lebar relatif).
+    """
+
+    def __init__(self, name, columns, collect, version, parse_params):
+        self.name = name
+        self.columns = columns
+        self.collect = collect
+        self.version = version
+        self.parse_params = parse_params
+
+
+class ReportManager:
+    """Antrian job laporan dengan cache artefak berbasis konten"""
+
+    def __init__(self, app, db, job_model):
+        self.app = app
+        self.db = db
+        self.job_model = job_model
+        self.types = {}
+        self.directory = os.path.abspath(app.config.get('REPORT_DIR', 'reports'))
+        self.ttl = timedelta(hours=app.config.get('REPORT_TTL_HOURS', 24))
+        self.process_workers = app.config.get('REPORT_PROCESSES', 2)
+        self._coordinator = ThreadPoolExecutor(
+            max_workers=app.config.get('REPORT_THREADS', 2),
+            thread_name_prefix='uks-report'
+        )
+        os.makedirs(self.directory, exist_ok=True)
+        self._pool = None
+
+    def register(self, name, columns, collect, version, parse_params):
+        self.types[name] = ReportType(name, columns, collect, version, parse_params)
+
+    def start(self):
+        """Siapkan process pool render; hanya di process yang melayani request"""
+        if self._pool is None:
+            self._pool = self._start_process_pool()
+
+    def _start_process_pool(self):
+        """Fork worker render sekarang, sebelum scheduler dan thread request berjalan
+
+        Fork dari process yang sudah multithread bisa membuat child deadlock pada lock
+        yang sedang dipegang thread lain. spawn/forkserver tidak dipakai karena child
+        akan mengimpor ulang app.py (membuat app, scheduler, dst.) saat dijalankan
+        dengan `python app.py`. Return None (render di thread koordinator) jika fork
+        tidak tersedia atau sudah ada thread lain.
+        """
+        if self.process_workers <= 0 or 'fork' not in multiprocessing.get_all_start_methods():
+            return None
+        if threading.active_count() > 1:
+            logger.warning('ReportManager dibuat setelah thread lain berjalan, laporan dirender tanpa process pool')
+            return None
+        pool = ProcessPoolExecutor(
+            max_workers=self.process_workers,
+            mp_context=multiprocessing.get_context('fork')
+        )
+        # Dengan fork semua worker dibuat pada submit pertama
+        pool.submit(os.getpid).result()
+        return pool
+
+    def _render(self, fmt, path, title, columns, rows):
+        pool = self._pool
+        if pool is not None:
+            try:
+                return pool.submit(render_report, fmt, path, title, columns, rows).result()
+            except BrokenProcessPool:
+                # Worker mati tidak bisa di-fork ulang dengan aman: lanjut tanpa pool
+                logger.warning('Process pool laporan rusak, render dilanjutkan di thread')
+                self._pool = None
+        return render_report(fmt, path, title, columns, rows)
+
+    # ---------- Cache key ----------
+
+    def cache_key(self, jenis, fmt, params):
+        report_type = self.types[jenis]
+        payload = json.dumps({
+            'jenis': jenis,
+            'format': fmt,
+            'params': params,
+            'versi': report_type.version(params)
+        }, sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def artifact_path(self, cache_key, fmt):
+        return os.path.join(self.directory, f'{cache_key}.{fmt}')
+
+    @staticmethod
+    def _reuse_artifact(path):
+        """Perbarui mtime artefak yang dipakai ulang agar prune menghitung TTL dari pemakaian terakhir"""
+        try:
+            os.utime(path)
+            return True
+        except FileNotFoundError:
+            return False
+
+    # ---------- Submit ----------
+
+    def submit(self, jenis, fmt, raw_params):
+        """Buat job laporan; return (job, created). Raise ValueError untuk input tidak valid"""
+        if jenis not in self.types:
+            raise ValueError(f'Jenis laporan tidak dikenal: {jenis}')
+        if fmt not in FORMATS:
+            raise ValueError(f'Format harus salah satu dari: {", ".join(FORMATS)}')
+
+        Job = self.job_model
+        session = self.db.session
+        params = self.types[jenis].parse_params(raw_params)
+        key = self.cache_key(jenis, fmt, params)
+        now = datetime.utcnow()
+
+        path = self.artifact_path(key, fmt)
+        # Job yang sedang render dengan data sama ditunggu saja; job pending/running
+        # yang terlalu lama dianggap mati (mis. worker di-restart)
+        stale = now - timedelta(minutes=self.app.config.get('REPORT_JOB_TIMEOUT_MINUTES', 10))
+        existing = Job.query.filter(
+            Job.cache_key == key,
+            Job.status.in_(('pending', 'running')),
+            Job.created_at > stale
+        ).order_by(Job.created_at.desc()).first()
+        if existing is not None:
+            return existing, False
+
+        job = Job(
+            id=uuid.uuid4().hex,
+            jenis=jenis,
+            format=fmt,
+            params=json.dumps(params, sort_keys=True),
+            cache_key=key,
+            status='pending',
+            created_at=now
+        )
+        # Artefak dengan data yang sama sudah ada: selesai tanpa render. Job lama yang
+        # sudah done tidak dipakai ulang karena prune menghapus job berdasarkan created_at
+        if self._reuse_artifact(path):
+            job.status = 'done'
+            job.ukuran = os.path.getsize(path)
+            job.finished_at = now
+            job.duration_ms = 0
+            job.cached = True
+        session.add(job)
+        session.commit()
+
+        if job.status == 'pending':
+            self._coordinator.submit(self._run, job.id)
+        return job, True
+
+    # ---------- Eksekusi ----------
+
+    def _update(self, job_id, **fields):
+        Job = self.job_model
+        Job.query.filter_by(id=job_id).update(fields, synchronize_session=False)
+        self.db.session.commit()
+
+    def _run(self, job_id):
+        start = time.perf_counter()
+        with self.app.app_context():
+            try:
+                job = self.db.session.get(self.job_model, job_id)
+                report_type = self.types[job.jenis]
+                params = json.loads(job.params)
+                fmt, path = job.format, self.artifact_path(job.cache_key, job.format)
+                self._update(job_id, status='running', started_at=datetime.utcnow())
+
+                title, rows = report_type.collect(params)
+                size = self._render(fmt, path, title, report_type.columns, rows)
+
+                self._update(
+                    job_id, status='done', ukuran=size, jumlah_baris=len(rows),
+                    finished_at=datetime.utcnow(),
+                    duration_ms=(time.perf_counter() - start) * 1000
+                )
+            except Exception as e:
+                self.db.session.rollback()
+                logger.exception('Laporan %s gagal', job_id)
+                self._update(
+                    job_id, status='failed', error=f'{type(e).__name__}: {e}',
+                    finished_at=datetime.utcnow(),
+                    duration_ms=(time.perf_counter() - start) * 1000
+                )
+            finally:
+                self.db.session.remove()
+
+    # ---------- Download & cleanup ----------
+
+    def download_name(self, job):
+        params = json.loads(job.params)
+        suffix = '_'.join(str(value) for _, value in sorted(params.items()))
+        return f"laporan_{job.jenis}{'_' + suffix if suffix else ''}.{job.format}"
+
+    def prune(self):
+        """Hapus artefak dan job yang lebih tua dari REPORT_TTL_HOURS"""
+        Job = self.job_model
+        cutoff = datetime.utcnow() - self.ttl
+        removed = 0
+        for name in os.listdir(self.directory):
+            path = os.path.join(self.directory, name)
+            if os.path.isfile(path) and datetime.utcfromtimestamp(os.path.getmtime(path)) < cutoff:
+                os.remove(path)
+                removed += 1
+        Job.query.filter(Job.created_at < cutoff).delete(synchronize_session=False)
+        self.db.session.commit()
+        return removed
@@ -0,0 +1,366 @@
+# Background scheduler untuk Sistem UKS Sekolah
+# Menjalankan job pemeliharaan (sweep kadaluarsa, refresh statistik, VACUUM/ANALYZE)
+# di luar request handler supaya tidak menambah latensi pengguna.
+
+import atexit
+import logging
+import os
+import socket
+import threading
+import time
+import traceback
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+from sqlalchemy.exc import IntegrityError
+
+logger = logging.getLogger(__name__)
+
+LEADER_LOCK_NAME = 'scheduler'
+
+
+class CronSchedule:
+    """Jadwal gaya cron dengan 5 field: menit jam tanggal bulan hari-minggu
+
+    Mendukung '*', '*/n', 'a-b', 'a-b/n' dan daftar dipisah koma.
+    Hari-minggu memakai 0-6 dengan 0 = Minggu (7 juga diterima sebagai Minggu).
+    """
+
+    FIELD_RANGES = [(0, 59), (0, 23), (1, 31), (1, 12), (0, 7)]
+
+    def __init__(self, expression):
+        self.expression = expression
+        fields = expression.split()
+        if len(fields) != 5:
+            raise ValueError(f'Ekspresi cron harus 5 field: {expression!r}')
+
+        parsed = [self._parse_field(field, low, high)
+                  for field, (low, high) in zip(fields, self.FIELD_RANGES)]
+        self.minutes, self.hours, self.days, self.months, self.weekdays = parsed
+        if 7 in self.weekdays:
+            self.weekdays = (self.weekdays - {7}) | {0}
+
+        # Sama seperti cron: jika tanggal dan hari-minggu dibatasi, cukup salah satu cocok
+        self.day_restricted = fields[2] != '*'
+        self.weekday_restricted = fields[4] != '*'
+
+    @staticmethod
+    def _parse_field(field, low, high):
+        values = set()
+        for part in field.split(','):
+            step = 1
+            if '/' in part:
+                part, step_str = part.split('/', 1)
+                step = int(step_str)
+                if step < 1:
+                    raise ValueError(f'Step cron tidak valid: {field!r}')
+
+            if part == '*':
+                start, end = low, high
+            elif '-' in part:
+                start_str, end_str = part.split('-', 1)
+                start, end = int(start_str), int(end_str)
+            else:
+                start = int(part)
+                end = high if step > 1 else start
+
+            if start < low or end > high or start > end:
+                raise ValueError(f'Nilai cron di luar rentang {low}-{high}: {field!r}')
+            values.update(range(start, end + 1, step))
+        return values
+
+    def matches(self, moment):
+        """Cek apakah menit `moment` termasuk jadwal ini"""
+        if moment.minute not in self.minutes or moment.hour not in self.hours:
+            return False
+        if moment.month not in self.months:
+            return False
+
+        day_match = moment.day in self.days
+        # datetime.weekday(): Senin = 0, cron: Minggu = 0
+        weekday_match = (moment.weekday() + 1) % 7 in self.weekdays
+        if self.day_restricted and self.weekday_restricted:
+            return day_match or weekday_match
+        return day_match and weekday_match
+
+    def next_after(self, moment):
+        """Waktu jalan berikutnya setelah `moment` (presisi menit)"""
+        candidate = moment.replace(second=0, microsecond=0) + timedelta(minutes=1)
+        # Batas satu tahun lebih sedikit cukup untuk semua ekspresi valid
+        for _ in range(60 * 24 * 367):
+            if self.matches(candidate):
+                return candidate
+            candidate += timedelta(minutes=1)
+        return None
+
+
+class ScheduledJob:
+    """Job yang terdaftar di scheduler"""
+
+    def __init__(self, name, func, schedule, description=''):
+        self.name = name
+        self.func = func
+        self.schedule = CronSchedule(schedule)
+        self.description = description
+
+    def to_dict(self, now=None):
+        next_run = self.schedule.next_after(now or datetime.now())
+        return {
+            'name': self.name,
+            'schedule': self.schedule.expression,
+            'description': self.description,
+            'next_run': next_run.isoformat() if next_run else None
+        }
+
+
+class Scheduler:
+    """Scheduler in-process dengan satu leader di antara worker gunicorn
+
+    Setiap worker menjalankan thread ticker, tetapi hanya worker yang memegang
+    lock di tabel `lock_model` yang mengeksekusi job. Lock diperpanjang setiap
+    tick dan otomatis diambil alih worker lain jika leader mati.
+    """
+
+    def __init__(self, app, db, lock_model, run_model):
+        self.app = app
+        self.db = db
+        self.lock_model = lock_model
+        self.run_model = run_model
+
+        self.jobs = {}
+        self.owner_id = f'{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}'
+        self.lock_ttl = app.config.get('SCHEDULER_LOCK_TTL', 90)
+        self.history_limit = app.config.get('SCHEDULER_HISTORY_LIMIT', 500)
+        self.is_leader = False
+
+        self._executor = None
+        self._thread = None
+        self._stop_event = threading.Event()
+        self._running = set()
+        self._running_lock = threading.Lock()
+        self._last_tick = None
+        self._local = threading.local()
+
+    # ---------- Registrasi job ----------
+
+    def job(self, schedule, name=None, description=None):
+        """Decorator untuk mendaftarkan fungsi sebagai job terjadwal"""
+        def decorator(func):
+            self.add_job(func, schedule, name=name, description=description)
+            return func
+        return decorator
+
+    def add_job(self, func, schedule, name=None, description=None):
+        job_name = name or func.__name__
+        if job_name in self.jobs:
+            raise ValueError(f'Job {job_name} sudah terdaftar')
+        self.jobs[job_name] = ScheduledJob(
+            job_name, func, schedule,
+            description if description is not None else (func.__doc__ or '').strip()
+        )
+        return self.jobs[job_name]
+
+    # ---------- Lifecycle ----------
+
+    def start(self):
+        if self._thread is not None:
+            return
+        # Dibuat ulang setelah fork (gunicorn --preload) agar setiap worker punya id sendiri
+        self.owner_id = f'{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}'
+        self._executor = ThreadPoolExecutor(
+            max_workers=self.app.config.get('SCHEDULER_WORKERS', 2),
+            thread_name_prefix='uks-job'
+        )
+        self._thread = threading.Thread(target=self._loop, name='uks-scheduler', daemon=True)
+        self._thread.start()
+        atexit.register(self.shutdown)
+        logger.info('Scheduler dimulai (%s)', self.owner_id)
+
+    def shutdown(self, wait=False):
+        self._stop_event.set()
+        if self._executor is not None:
+            self._executor.shutdown(wait=wait)
+        if self.is_leader:
+            self._release_leadership()
+
+    # ---------- Leader election ----------
+
+    def _try_acquire_leadership(self):
+        """Ambil atau perpanjang lock leader secara atomik lewat UPDATE bersyarat"""
+        Lock = self.lock_model
+        session = self.db.session
+        now = datetime.utcnow()
+        expires_at = now + timedelta(seconds=self.lock_ttl)
+
+        try:
+            if session.get(Lock, LEADER_LOCK_NAME) is None:
+                try:
+                    session.add(Lock(name=LEADER_LOCK_NAME, owner=self.owner_id, expires_at=expires_at))
+                    session.commit()
+                    return True
+                except IntegrityError:
+                    # Worker lain lebih dulu membuat baris lock
+                    session.rollback()
+
+            updated = Lock.query.filter(
+                Lock.name == LEADER_LOCK_NAME,
+                (Lock.owner == self.owner_id) | (Lock.expires_at < now)
+            ).update({'owner': self.owner_id, 'expires_at': expires_at}, synchronize_session=False)
+            session.commit()
+            return updated == 1
+        except Exception:
+            session.rollback()
+            logger.exception('Gagal memperbarui lock scheduler')
+            return False
+
+    def _release_leadership(self):
+        try:
+            with self.app.app_context():
+                self.lock_model.query.filter_by(
+                    name=LEADER_LOCK_NAME, owner=self.owner_id
+                ).delete(synchronize_session=False)
+                self.db.session.commit()
+        except Exception:
+            logger.exception('Gagal melepas lock scheduler')
+        self.is_leader = False
+
+    # ---------- Loop utama ----------
+
+    def _loop(self):
+        while not self._stop_event.is_set():
+            now = datetime.now()
+            with self.app.app_context():
+                self.is_leader = self._try_acquire_leadership()
+                self.db.session.remove()
+
+            if self.is_leader:
+                for job in self._due_jobs(now):
+                    self.submit(job.name)
+            self._last_tick = now
+
+            # Tidur sampai awal menit berikutnya
+            self._stop_event.wait(60 - now.second - now.microsecond / 1_000_000)
+
+    def _due_jobs(self, now):
+        """Job yang jatuh tempo sejak tick terakhir (menit yang terlewat tetap dijalankan sekali)"""
+        current = now.replace(second=0, microsecond=0)
+        if self._last_tick is None:
+            minutes = [current]
+        else:
+            last = self._last_tick.replace(second=0, microsecond=0)
+            gap = min(int((current - last).total_seconds() // 60), 60)
+            minutes = [current - timedelta(minutes=i) for i in range(gap - 1, -1, -1)]
+
+        due = []
+        for job in self.jobs.values():
+            if any(job.schedule.matches(minute) for minute in minutes):
+                due.append(job)
+        return due
+
+    # ---------- Eksekusi ----------
+
+    def submit(self, name, trigger='schedule'):
+        """Jalankan job di thread pool. Return False jika job sedang berjalan"""
+        if name not in self.jobs:
+            raise KeyError(name)
+        with self._running_lock:
+            if name in self._running:
+                return False
+            self._running.add(name)
+
+        if self._executor is None:
+            # Scheduler tidak dijalankan (mis. SCHEDULER_ENABLED=false): jalankan di thread sendiri
+            threading.Thread(target=self._run_job, args=(name, trigger), daemon=True).start()
+        else:
+            self._executor.submit(self._run_job, name, trigger)
+        return True
+
+    def _run_job(self, name, trigger):
+        job = self.jobs[name]
+        started_at = datetime.utcnow()
+        start = time.perf_counter()
+        status, error, result = 'success', None, None
+
+        self._local.trigger = trigger
+        try:
+            with self.app.app_context():
+                try:
+                    result = job.func()
+                except Exception:
+                    self.db.session.rollback()
+                    raise
+                finally:
+                    self.db.session.remove()
+        except Exception as e:
+            status = 'failed'
+            error = f'{type(e).__name__}: {e}'
+            logger.error('Job %s gagal:\n%s', name, traceback.format_exc())
+        finally:
+            self._local.trigger = None
+            with self._running_lock:
+                self._running.discard(name)
+
+        duration_ms = (time.perf_counter() - start) * 1000
+        self._record_run(name, trigger, started_at, duration_ms, status, error, result)
+
+    def current_trigger(self):
+        """Trigger job yang sedang berjalan di thread ini ('schedule'/'manual'), None di luar job"""
+        return getattr(self._local, 'trigger', None)
+
+    def _record_run(self, name, trigger, started_at, duration_ms, status, error, result):
+        Run = self.run_model
+        with self.app.app_context():
+            try:
+                self.db.session.add(Run(
+                    job_name=name,
+                    trigger=trigger,
+                    worker=self.owner_id,
+                    started_at=started_at,
+                    finished_at=datetime.utcnow(),
+                    duration_ms=duration_ms,
+                    status=status,
+                    message=error or (str(result) if result is not None else None)
+                ))
+                self.db.session.commit()
+            except Exception:
+                self.db.session.rollback()
+                logger.exception('Gagal mencatat riwayat job %s', name)
+            finally:
+                self.db.session.remove()
+
+    def prune_history(self):
+        """Hapus riwayat job lama, sisakan `history_limit` baris terbaru"""
+        Run = self.run_model
+        cutoff = Run.query.order_by(Run.id.desc()).offset(self.history_limit).first()
+        if cutoff is None:
+            return 0
+        deleted = Run.query.filter(Run.id <= cutoff.id).delete(synchronize_session=False)
+        self.db.session.commit()
+        return deleted
+
+    # ---------- Status ----------
+
+    def status(self, history=50):
+        Run = self.run_model
+        now = datetime.now()
+        jobs = []
+        for job in self.jobs.values():
+            info = job.to_dict(now)
+            runs = Run.query.filter_by(job_name=job.name).order_by(Run.id.desc()).limit(20).all()
+            durations = [run.duration_ms for run in runs if run.duration_ms is not None]
+            info['last_run'] = runs[0].to_dict() if runs else None
+            info['avg_duration_ms'] = round(sum(durations) / len(durations), 2) if durations else None
+            info['running'] = job.name in self._running
+            jobs.append(info)
+
+        recent = Run.query.order_by(Run.id.desc()).limit(history).all()
+        lock = self.db.session.get(self.lock_model, LEADER_LOCK_NAME)
+        return {
+            'worker': self.owner_id,
+            'enabled': self._thread is not None,
+            'is_leader': self.is_leader,
+            'leader': lock.to_dict() if lock else None,
+            'jobs': jobs,
+            'history': [run.to_dict() for run in recent]
+        }
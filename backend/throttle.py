@@ -0,0 +1,253 @@
+# Request coalescing dan admission control untuk Sistem UKS Sekolah
+# Saat bel sekolah berbunyi banyak tab memuat ulang endpoint yang sama secara bersamaan.
+# Modul ini menggabungkan GET identik ke satu komputasi, membatasi laju per klien dan
+# membatasi jumlah request berat yang berjalan bersamaan (sisanya dijawab 429).
+
+import math
+import threading
+import time
+from functools import wraps
+
+from flask import current_app, jsonify, make_response, request
+
+
+def too_many_requests(message, retry_after):
+    """Response 429 dengan header Retry-After (detik, dibulatkan ke atas)"""
+    response = jsonify({
+        'success': False,
+        'message': message
+    })
+    response.status_code = 429
+    response.headers['Retry-After'] = str(max(1, math.ceil(retry_after)))
+    return response
+
+
+def client_id():
+    """Identitas klien: remote_addr
+
+    Di belakang proxy, ProxyFix (TRUSTED_PROXY_HOPS) sudah mengganti remote_addr dengan
+    IP yang ditambahkan proxy tepercaya. Entri X-Forwarded-For yang dikirim klien
+    sendiri tidak pernah dipakai, jadi tidak bisa dipakai untuk mendapat bucket baru.
+    """
+    return request.remote_addr or 'unknown'
+
+
+class FlightTimeout(Exception):
+    """Komputasi leader tidak selesai dalam batas waktu tunggu follower"""
+
+
+class _Call:
+    """Komputasi yang sedang berjalan, ditunggu oleh request lain dengan key sama"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """Gabungkan request GET identik yang datang bersamaan ke satu eksekusi view
+
+    Request pertama (leader) menjalankan view; request lain dengan key sama menunggu
+    lalu menerima salinan response leader. Generasi dinaikkan setiap ada write
+    sehingga request yang datang setelah write tidak bergabung ke komputasi lama.
+    """
+
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+        self._generation = 0
+        self.stats = {'leaders': 0, 'coalesced': 0, 'timeouts': 0}
+
+    def invalidate(self):
+        with self._lock:
+            self._generation += 1
+
+    def do(self, key, func, timeout=None):
+        """Jalankan `func` sekali per key; follower menunggu paling lama `timeout` detik"""
+        with self._lock:
+            key = (self._generation, key)
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = _Call()
+                self._calls[key] = call
+                self.stats['leaders'] += 1
+            else:
+                self.stats['coalesced'] += 1
+
+        if not leader:
+            if not call.done.wait(timeout):
+                with self._lock:
+                    self.stats['timeouts'] += 1
+                raise FlightTimeout(key)
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = func()
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+            call.done.set()
+        return call.result
+
+
+class RateLimiter:
+    """Token bucket per klien: `rate` request per detik dengan kapasitas `burst`"""
+
+    MAX_BUCKETS = 10000
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def acquire(self, key):
+        """Return 0 jika diizinkan, selain itu detik sampai token berikutnya tersedia"""
+        now = time.monotonic()
+        with self._lock:
+            tokens, last = self._buckets.get(key, (self.burst, now))
+            tokens = min(self.burst, tokens + (now - last) * self.rate)
+            if tokens >= 1:
+                self._buckets[key] = (tokens - 1, now)
+                wait = 0
+            else:
+                self._buckets[key] = (tokens, now)
+                wait = (1 - tokens) / self.rate
+
+            if len(self._buckets) > self.MAX_BUCKETS:
+                self._prune(now)
+        return wait
+
+    def _prune(self, now):
+        # Bucket yang sudah penuh kembali sama saja dengan klien baru
+        full_after = self.burst / self.rate
+        for key, (_, last) in list(self._buckets.items()):
+            if now - last >= full_after:
+                del self._buckets[key]
+
+
+class ConcurrencyGate:
+    """Batasi jumlah eksekusi bersamaan; request yang tidak kebagian slot ditolak"""
+
+    def __init__(self, limit, queue_timeout):
+        self.limit = limit
+        self.queue_timeout = queue_timeout
+        self._semaphore = threading.BoundedSemaphore(limit)
+        self._active = 0
+        self._lock = threading.Lock()
+        self.stats = {'admitted': 0, 'rejected': 0}
+
+    def acquire(self):
+        if not self._semaphore.acquire(timeout=self.queue_timeout):
+            with self._lock:
+                self.stats['rejected'] += 1
+            return False
+        with self._lock:
+            self._active += 1
+            self.stats['admitted'] += 1
+        return True
+
+    def release(self):
+        with self._lock:
+            self._active -= 1
+        self._semaphore.release()
+
+    @property
+    def active(self):
+        return self._active
+
+
+class Throttle:
+    """Extension Flask yang menyatukan single-flight, rate limit dan concurrency gate"""
+
+    def __init__(self, app=None):
+        self.flight = SingleFlight()
+        self.limiter = None
+        self.gates = {}
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        per_minute = app.config.get('RATE_LIMIT_PER_MINUTE', 0)
+        if per_minute:
+            self.limiter = RateLimiter(per_minute / 60.0, app.config.get('RATE_LIMIT_BURST', per_minute))
+        self.exempt_paths = set(app.config.get('RATE_LIMIT_EXEMPT', ()))
+        app.before_request(self._check_rate_limit)
+        app.after_request(self._invalidate_on_write)
+
+    def _check_rate_limit(self):
+        if self.limiter is None or not request.path.startswith('/api/'):
+            return None
+        if request.path in self.exempt_paths or request.method == 'OPTIONS':
+            return None
+        wait = self.limiter.acquire(client_id())
+        if wait:
+            return too_many_requests('Terlalu banyak request, coba lagi sebentar', wait)
+        return None
+
+    def _invalidate_on_write(self, response):
+        if request.method not in ('GET', 'HEAD', 'OPTIONS') and response.status_code < 400:
+            self.flight.invalidate()
+        return response
+
+    def coalesce(self, view):
+        """Decorator: GET identik yang berjalan bersamaan berbagi satu eksekusi view"""
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            if request.method != 'GET':
+                return view(*args, **kwargs)
+
+            def compute():
+                response = make_response(view(*args, **kwargs))
+                return response.get_data(), response.status_code, list(response.headers.items())
+
+            try:
+                data, status, headers = self.flight.do(
+                    request.full_path, compute, self.app.config.get('COALESCE_TIMEOUT', 10)
+                )
+            except FlightTimeout:
+                return too_many_requests(
+                    'Server sedang sibuk, coba lagi sebentar',
+                    self.app.config.get('HEAVY_RETRY_AFTER', 2)
+                )
+            return current_app.response_class(data, status=status, headers=headers)
+        return wrapper
+
+    def limit_concurrency(self, view):
+        """Decorator: batasi eksekusi bersamaan view berat, kelebihan dijawab 429"""
+        gate = ConcurrencyGate(
+            self.app.config.get('HEAVY_CONCURRENCY_LIMIT', 4),
+            self.app.config.get('HEAVY_QUEUE_TIMEOUT', 0.5)
+        )
+        self.gates[view.__name__] = gate
+
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            if not gate.acquire():
+                return too_many_requests(
+                    'Server sedang sibuk, coba lagi sebentar',
+                    self.app.config.get('HEAVY_RETRY_AFTER', 2)
+                )
+            try:
+                return view(*args, **kwargs)
+            finally:
+                gate.release()
+        return wrapper
+
+    def status(self):
+        return {
+            'coalescing': dict(self.flight.stats),
+            'rateLimitPerMinute': self.app.config.get('RATE_LIMIT_PER_MINUTE', 0),
+            'gates': {
+                name: dict(gate.stats, active=gate.active, limit=gate.limit)
+                for name, gate in self.gates.items()
+            }
+        }
@@ -166,6 +166,101 @@ PORT=5000
     print("✅ Created .env.template file")
     print("Copy this to .env and fill in your values")
 
+def get_backup_manager():
+    """Create BackupManager from backend/config.py (reads .env / DATABASE_URL)"""
+    backend_dir = Path(__file__).resolve().parent / 'backend'
+    sys.path.insert(0, str(backend_dir))
+    from config import Config
+    from backup import BackupManager
+    
+    config = {key: getattr(Config, key) for key in dir(Config) if key.isupper()}
+    return BackupManager.from_config(config, str(backend_dir / 'instance'))
+
+def format_size(size):
+    """Format byte size for display"""
+    for unit in ('B', 'KB', 'MB', 'GB'):
+        if size < 1024 or unit == 'GB':
+            return f"{size:.1f} {unit}" if unit != 'B' else f"{size} B"
+        size /= 1024
+
+def backup_cli(argv):
+    """Backup, restore and verify commands: python deploy.py <command> [args]"""
+    import argparse
+    
+    parser = argparse.ArgumentParser(prog='deploy.py', description='Backup & restore database Sistem UKS Sekolah')
+    commands = parser.add_subparsers(dest='command', required=True)
+    commands.add_parser('backup', help='Create an online snapshot now')
+    commands.add_parser('list', help='List snapshots in BACKUP_DIR')
+    verify_parser = commands.add_parser('verify', help='Check integrity of a snapshot')
+    verify_parser.add_argument('backup', help='Snapshot name or file path')
+    restore_parser = commands.add_parser('restore', help='Restore database from a snapshot')
+    restore_parser.add_argument('backup', help='Snapshot name or file path')
+    restore_parser.add_argument('-y', '--yes', action='store_true', help='Skip confirmation')
+    bench_parser = commands.add_parser('backup-bench', help='Measure write latency during a backup')
+    bench_parser.add_argument('--rows', type=int, default=200000)
+    args = parser.parse_args(argv)
+    
+    manager = get_backup_manager()
+    from backup import BackupError
+    
+    try:
+        if args.command == 'backup':
+            print("💾 Creating backup...")
+            manifest = manager.backup(label='manual')
+            print(f"✅ {manifest['file']} ({format_size(manifest['size'])}, {manifest['duration_ms']:.0f} ms)")
+            for table, count in manifest['verification'].get('tables', {}).items():
+                print(f"   {table}: {count} rows")
+        
+        elif args.command == 'list':
+            backups = manager.list_backups()
+            if not backups:
+                print(f"No backups in {manager.backup_dir}")
+            for manifest in backups:
+                print(f"{manifest['name']:<40} {format_size(manifest['size']):>10}  {manifest['created_at'][:19]}")
+        
+        elif args.command == 'verify':
+            path = manager.resolve(args.backup)
+            print(f"🔍 Verifying {path}...")
+            result = manager.verify(path)
+            if not result['ok']:
+                print(f"❌ Backup corrupt: {result['integrity']}")
+                return 1
+            print("✅ Backup OK")
+            for table, count in result.get('tables', {}).items():
+                print(f"   {table}: {count} rows")
+        
+        elif args.command == 'restore':
+            path = manager.resolve(args.backup)
+            if not args.yes:
+                answer = input(f"⚠️  Replace current database with {os.path.basename(path)}? (y/N): ").strip().lower()
+                if answer != 'y':
+                    print("Restore cancelled")
+                    return 1
+            print("♻️  Restoring...")
+            result = manager.restore(path)
+            print(f"✅ Restored from {result['restored_from']}")
+            if result['safety_backup']:
+                print(f"   Previous database saved as {result['safety_backup']}")
+            print("Restart the application so cached data is reloaded")
+        
+        elif args.command == 'backup-bench':
+            from backup import benchmark_write_latency
+            print(f"⏱️  Measuring write latency ({args.rows} rows)...")
+            results = benchmark_write_latency(rows=args.rows, pages=manager.pages, sleep=manager.sleep)
+            print(f"{'Journal':<9}{'Scenario':<14}{'backup':>10}{'writes':>8}{'p50':>9}{'p99':>9}{'max':>9}  mode")
+            for journal_mode, scenarios in results.items():
+                for scenario in ('idle', 'single-step', 'stepped'):
+                    r = scenarios[scenario]
+                    mode = r['details']['mode'] if r['details'] else '-'
+                    print(f"{journal_mode:<9}{scenario:<14}{r['backup_ms']:>8.0f}ms{r['writes']:>8}"
+                          f"{r['p50_ms']:>7.2f}ms{r['p99_ms']:>7.2f}ms{r['max_ms']:>7.2f}ms  {mode}")
+            print(f"Database size: {results['wal']['size_mb']} MB, "
+                  f"{manager.pages} pages/step, {manager.sleep * 1000:.0f} ms sleep")
+    except (BackupError, subprocess.CalledProcessError) as e:
+        print(f"❌ {getattr(e, 'stderr', None) or e}")
+        return 1
+    return 0
+
 def main():
     """Main deployment script"""
     print("🚀 Sistem UKS Sekolah - Deployment Helper")
@@ -220,4 +315,6 @@ def main():
     print("Check DEPLOYMENT.md for detailed instructions and troubleshooting.")
 
 if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        sys.exit(backup_cli(sys.argv[1:]))
     main()
\ No newline at end of file
@@ -19,13 +19,14 @@ class APIClient {
      * @param {string} method - HTTP method (GET, POST, PUT, DELETE)
      * @param {Object} data - Request body data
      * @param {number} timeout - Request timeout in milliseconds
+     * @param {Object} extraHeaders - Additional request headers (e.g. Idempotency-Key)
      * @returns {Promise} Response data
      */
-    async request(endpoint, method = 'GET', data = null, timeout = 10000) {
+    async request(endpoint, method = 'GET', data = null, timeout = 10000, extraHeaders = {}) {
         const url = `${this.baseURL}${endpoint}`;
         const config = {
             method: method,
-            headers: this.headers,
+            headers: { ...this.headers, ...extraHeaders },
             signal: AbortSignal.timeout(timeout)
         };
 
@@ -33,37 +34,42 @@ class APIClient {
             config.body = JSON.stringify(data);
         }
 
+        let response;
         try {
-            const response = await fetch(url, config);
-            
-            if (!response.ok) {
-                let errorMessage = `HTTP ${response.status}`;
-                try {
-                    const errorData = await response.json();
-                    errorMessage = errorData.message || errorMessage;
-                } catch (e) {
-                    // If response is not JSON, use status text
-                    errorMessage = response.statusText || errorMessage;
-                }
-                throw new Error(errorMessage);
-            }
-            
-            const result = await response.json();
-            return result;
+            response = await fetch(url, config);
         } catch (error) {
             console.error(`API request failed: ${method} ${endpoint}`, error);
             
-            // Enhanced error messages for better UX
-            if (error.name === 'AbortError') {
-                throw new Error('Request timeout - periksa koneksi internet Anda');
-            } else if (error.message.includes('Failed to fetch')) {
-                throw new Error('Tidak dapat terhubung ke server - periksa koneksi internet');
+            // Server not reached: callers may fall back to the offline cache/queue
+            let networkError;
+            if (error.name === 'AbortError' || error.name === 'TimeoutError') {
+                networkError = new Error('Request timeout - periksa koneksi internet Anda');
             } else if (error.message.includes('NetworkError')) {
-                throw new Error('Masalah jaringan - coba lagi dalam beberapa saat');
+                networkError = new Error('Masalah jaringan - coba lagi dalam beberapa saat');
+            } else {
+                networkError = new Error('Tidak dapat terhubung ke server - periksa koneksi internet');
             }
-            
-            throw error;
+            networkError.isNetworkError = true;
+            throw networkError;
+        }
+        
+        if (!response.ok) {
+            let errorMessage = `HTTP ${response.status}`;
+            try {
+                const errorData = await response.json();
+                errorMessage = errorData.message || errorMessage;
+            } catch (e) {
+                // If response is not JSON, use status text
+                errorMessage = response.statusText || errorMessage;
+            }
+            console.error(`API request failed: ${method} ${endpoint}`, errorMessage);
+            const httpError = new Error(errorMessage);
+            httpError.status = response.status;
+            httpError.retryAfter = parseInt(response.headers.get('Retry-After'), 10) || null;
+            throw httpError;
         }
+        
+        return await response.json();
     }
 
     // ==================== OBAT API METHODS ====================
@@ -98,10 +104,12 @@ class APIClient {
      * Update existing obat
      * @param {number} id - Obat ID
      * @param {Object} obatData - Updated obat data
+     * @param {string} idempotencyKey - Key so retries are applied only once
      * @returns {Promise<Object>} Updated obat
      */
-    async updateObat(id, obatData) {
-        return await this.request(`/obat/${id}`, 'PUT', obatData);
+    async updateObat(id, obatData, idempotencyKey = null) {
+        const headers = idempotencyKey ? { 'Idempotency-Key': idempotencyKey } : {};
+        return await this.request(`/obat/${id}`, 'PUT', obatData, 10000, headers);
     }
 
     /**
@@ -139,6 +147,16 @@ class APIClient {
         return await this.request('/pasien');
     }
 
+    /**
+     * Get pasien records within a date range, including archived school years
+     * @param {string} dari - Start date in YYYY-MM-DD format
+     * @param {string} sampai - End date in YYYY-MM-DD format
+     * @returns {Promise<Array>} List of pasien
+     */
+    async getPasienByRange(dari, sampai) {
+        return await this.request(`/pasien?dari=${dari}&sampai=${sampai}`);
+    }
+
     /**
      * Get pasien by ID
      * @param {number} id - Pasien ID
@@ -151,10 +169,12 @@ class APIClient {
     /**
      * Add new pasien record
      * @param {Object} pasienData - Pasien data
+     * @param {string} idempotencyKey - Key so retries never duplicate the visit
      * @returns {Promise<Object>} Created pasien record
      */
-    async addPasien(pasienData) {
-        return await this.request('/pasien', 'POST', pasienData);
+    async addPasien(pasienData, idempotencyKey = null) {
+        const headers = idempotencyKey ? { 'Idempotency-Key': idempotencyKey } : {};
+        return await this.request('/pasien', 'POST', pasienData, 10000, headers);
     }
 
     /**
@@ -175,6 +195,28 @@ class APIClient {
         return await this.request(`/pasien/harian?date=${date}`);
     }
 
+    // ==================== LAPORAN API METHODS ====================
+
+    /**
+     * Request a server-side report job
+     * @param {string} jenis - kunjungan_harian, kunjungan_bulanan, inventaris, kadaluarsa
+     * @param {string} format - csv, xlsx or pdf
+     * @param {Object} params - Report parameters (tanggal, bulan, hari)
+     * @returns {Promise<Object>} Report job
+     */
+    async createReport(jenis, format, params = {}) {
+        return await this.request('/laporan', 'POST', { ...params, jenis, format });
+    }
+
+    /**
+     * Get report job status
+     * @param {string} id - Report job ID
+     * @returns {Promise<Object>} Report job
+     */
+    async getReportStatus(id) {
+        return await this.request(`/laporan/${id}`);
+    }
+
     /**
      * Record medicine distribution to patient
      * @param {Object} distributionData - Medicine distribution data
@@ -424,22 +466,34 @@ const mockAPI = new MockAPIService();
 
 // API wrapper that switches between real and mock API
 const api = {
-    async getAllObat() {
+    async getAllObat(onCached = null) {
         if (API_CONFIG.USE_REAL_API) {
-            return await apiClient.getAllObat();
+            return await offlineData.read('obat', () => apiClient.getAllObat(), onCached);
         } else {
             return await mockAPI.getAllObat();
         }
     },
     
-    async getAllPasien() {
+    async getAllPasien(onCached = null) {
         if (API_CONFIG.USE_REAL_API) {
-            return await apiClient.getAllPasien();
+            return await offlineData.read('pasien', () => apiClient.getAllPasien(), onCached);
         } else {
             return await mockAPI.getAllPasien();
         }
     },
     
+    async getPasienByRange(dari, sampai) {
+        if (API_CONFIG.USE_REAL_API) {
+            return await apiClient.getPasienByRange(dari, sampai);
+        } else {
+            const response = await mockAPI.getAllPasien();
+            return {
+                ...response,
+                data: response.data.filter(p => p.tanggal_kunjungan >= dari && p.tanggal_kunjungan <= sampai)
+            };
+        }
+    },
+    
     async getDashboardStats() {
         if (API_CONFIG.USE_REAL_API) {
             return await apiClient.getDashboardStats();
@@ -479,7 +533,15 @@ const api = {
     
     async updateObat(id, obatData) {
         if (API_CONFIG.USE_REAL_API) {
-            return await apiClient.updateObat(id, obatData);
+            const current = (await offlineData.store.getAll('obat').catch(() => [])).find(o => o.id === id) || { id };
+            return await offlineData.write({
+                resource: 'obat',
+                method: 'PUT',
+                endpoint: `/obat/${id}`,
+                data: obatData,
+                send: key => apiClient.updateObat(id, obatData, key),
+                localRecord: { ...current, ...obatData, updated_at: new Date().toISOString() }
+            });
         } else {
             // Simulate API call for mock
             await mockAPI.delay(1000);
@@ -520,7 +582,14 @@ const api = {
     
     async addPasien(pasienData) {
         if (API_CONFIG.USE_REAL_API) {
-            return await apiClient.addPasien(pasienData);
+            return await offlineData.write({
+                resource: 'pasien',
+                method: 'POST',
+                endpoint: '/pasien',
+                data: pasienData,
+                send: key => apiClient.addPasien(pasienData, key),
+                localRecord: { ...pasienData, id: `local-${Date.now()}`, created_at: new Date().toISOString() }
+            });
         } else {
             // Simulate API call for mock
             await mockAPI.delay(1000);
@@ -539,7 +608,39 @@ const api = {
     }
 };
 
+/**
+ * Generate a report on the server, wait for it and start the download
+ * @param {string} jenis - Report type
+ * @param {string} format - csv, xlsx or pdf
+ * @param {Object} params - Report parameters
+ * @param {number} maxWait - Maximum wait in milliseconds
+ */
+async function downloadReport(jenis, format, params = {}, maxWait = 120000) {
+    showToast('Menyiapkan laporan...', 'info');
+    try {
+        let job = (await apiClient.createReport(jenis, format, params)).data;
+        const deadline = Date.now() + maxWait;
+        
+        while (job.status === 'pending' || job.status === 'running') {
+            if (Date.now() > deadline) {
+                throw new Error('Laporan terlalu lama dibuat, coba lagi nanti');
+            }
+            await new Promise(resolve => setTimeout(resolve, 1000));
+            job = (await apiClient.getReportStatus(job.id)).data;
+        }
+        
+        if (job.status !== 'done') {
+            throw new Error(job.error || 'Laporan gagal dibuat');
+        }
+        window.location.href = `${apiClient.baseURL}/laporan/${job.id}/unduh`;
+    } catch (error) {
+        console.error('Error downloading report:', error);
+        showToast(`Gagal membuat laporan: ${error.message}`, 'error');
+    }
+}
+
 // Export untuk digunakan di file lain
+window.downloadReport = downloadReport;
 window.APIClient = APIClient;
 window.MockAPIService = MockAPIService;
 window.apiClient = apiClient;
@@ -11,6 +11,11 @@ document.addEventListener('DOMContentLoaded', function() {
     initializeInventaris();
 });
 
+// Reload after queued offline writes reach the server
+window.addEventListener('uks:synced', function() {
+    loadObatData();
+});
+
 /**
  * Initialize inventaris page
  */
@@ -39,12 +44,19 @@ async function loadObatData() {
         showTableLoading();
         
         // Use API wrapper that switches between real and mock API
-        const response = await api.getAllObat();
+        // Cached data from IndexedDB renders immediately, fresh data replaces it
+        const response = await api.getAllObat(cached => {
+            obatData = cached.data;
+            applyFilters(document.getElementById('searchObat').value.toLowerCase());
+        });
         
         if (response.success) {
             obatData = response.data;
-            filteredData = [...obatData];
-            renderObatTable();
+            applyFilters(document.getElementById('searchObat').value.toLowerCase());
+            
+            if (response.offline) {
+                showAlert('Offline - menampilkan data tersimpan', 'warning');
+            }
         } else {
             throw new Error(response.message || 'Gagal memuat data obat');
         }
@@ -682,7 +694,11 @@ async function handleEditObat(event) {
             modal.hide();
             event.target.reset();
             
-            showAlert('Obat berhasil diupdate', 'success');
+            if (response.queued) {
+                showAlert(response.message, 'warning');
+            } else {
+                showAlert('Obat berhasil diupdate', 'success');
+            }
         } else {
             throw new Error(response.message || 'Gagal mengupdate obat');
         }
@@ -0,0 +1,388 @@
+/**
+ * Offline Data Layer untuk Sistem UKS Sekolah
+ * IndexedDB cache untuk data Obat/Pasien dan antrian write yang dikirim ulang
+ * (dengan Idempotency-Key yang sama) saat koneksi kembali
+ */
+
+const OFFLINE_DB_NAME = 'uks-sekolah';
+const OFFLINE_DB_VERSION = 1;
+const OFFLINE_REPLAY_INTERVAL = 30000;
+const OFFLINE_BACKOFF_MAX = 15 * 60 * 1000;
+// Batas error server untuk satu entri agar tidak menahan antrian di belakangnya selamanya
+const OFFLINE_MAX_ATTEMPTS = 10;
+// Hanya error validasi yang membuang entri antrian; error lain dicoba lagi
+const OFFLINE_DISCARD_STATUS = [400, 404, 422];
+
+/**
+ * Generate unique idempotency key
+ * @returns {string} Random UUID
+ */
+function generateIdempotencyKey() {
+    if (window.crypto && typeof window.crypto.randomUUID === 'function') {
+        return window.crypto.randomUUID();
+    }
+    // randomUUID hanya tersedia di secure context (https/localhost)
+    return 'xxxxxxxx-xxxx-4xxx-yxxx-xxxxxxxxxxxx'.replace(/[xy]/g, c => {
+        const r = Math.random() * 16 | 0;
+        return (c === 'x' ? r : (r & 0x3 | 0x8)).toString(16);
+    });
+}
+
+/**
+ * Check whether an error means the server was not reached at all
+ * @param {Error} error - Error thrown by APIClient.request
+ * @returns {boolean} True for network/timeout errors
+ */
+function isNetworkError(error) {
+    return Boolean(error && error.isNetworkError);
+}
+
+/**
+ * Check whether a failed queued write should be kept and retried later
+ * @param {Error} error - Error thrown by APIClient.request
+ * @returns {boolean} False only for validation errors (400/404/422)
+ */
+function isRetryableError(error) {
+    return isNetworkError(error) || !OFFLINE_DISCARD_STATUS.includes(error.status);
+}
+
+/**
+ * Delay before retrying a write the server failed on (exponential, capped)
+ * @param {number} attempts - Failed attempts so far
+ * @returns {number} Delay in milliseconds
+ */
+function replayBackoff(attempts) {
+    return Math.min(OFFLINE_REPLAY_INTERVAL * Math.pow(2, attempts - 1), OFFLINE_BACKOFF_MAX);
+}
+
+class OfflineStore {
+    constructor(name = OFFLINE_DB_NAME, version = OFFLINE_DB_VERSION) {
+        this.name = name;
+        this.version = version;
+        this.dbPromise = null;
+    }
+
+    /**
+     * Open IndexedDB, creating object stores on first use
+     * @returns {Promise<IDBDatabase>} Database handle
+     */
+    open() {
+        if (!('indexedDB' in window)) {
+            return Promise.reject(new Error('IndexedDB tidak didukung browser ini'));
+        }
+        if (!this.dbPromise) {
+            this.dbPromise = new Promise((resolve, reject) => {
+                const request = indexedDB.open(this.name, this.version);
+                request.onupgradeneeded = () => {
+                    const db = request.result;
+                    if (!db.objectStoreNames.contains('obat')) {
+                        db.createObjectStore('obat', { keyPath: 'id' });
+                    }
+                    if (!db.objectStoreNames.contains('pasien')) {
+                        db.createObjectStore('pasien', { keyPath: 'id' });
+                    }
+                    if (!db.objectStoreNames.contains('outbox')) {
+                        db.createObjectStore('outbox', { keyPath: 'idempotencyKey' });
+                    }
+                };
+                request.onsuccess = () => resolve(request.result);
+                request.onerror = () => reject(request.error);
+            });
+            this.dbPromise.catch(() => { this.dbPromise = null; });
+        }
+        return this.dbPromise;
+    }
+
+    /**
+     * Run a transaction and resolve with the result of the last request
+     * @param {string} storeName - Object store name
+     * @param {string} mode - 'readonly' or 'readwrite'
+     * @param {Function} callback - Receives the object store, returns an IDBRequest (optional)
+     * @returns {Promise<any>} Request result
+     */
+    async transaction(storeName, mode, callback) {
+        const db = await this.open();
+        return new Promise((resolve, reject) => {
+            const tx = db.transaction(storeName, mode);
+            const request = callback(tx.objectStore(storeName));
+            tx.oncomplete = () => resolve(request ? request.result : undefined);
+            tx.onerror = () => reject(tx.error);
+            tx.onabort = () => reject(tx.error);
+        });
+    }
+
+    async getAll(storeName) {
+        return await this.transaction(storeName, 'readonly', store => store.getAll());
+    }
+
+    async put(storeName, record) {
+        return await this.transaction(storeName, 'readwrite', store => store.put(record));
+    }
+
+    async delete(storeName, key) {
+        return await this.transaction(storeName, 'readwrite', store => store.delete(key));
+    }
+
+    /**
+     * Replace all records of a store with a fresh server snapshot
+     * @param {string} storeName - Object store name
+     * @param {Array} records - Records from the server
+     */
+    async replaceAll(storeName, records) {
+        return await this.transaction(storeName, 'readwrite', store => {
+            store.clear();
+            records.forEach(record => store.put(record));
+        });
+    }
+}
+
+class WriteQueue {
+    constructor(store) {
+        this.store = store;
+        this.replaying = null;
+    }
+
+    /**
+     * Queue a write for later delivery
+     * @param {Object} entry - { idempotencyKey, resource, method, endpoint, data, localId }
+     */
+    async enqueue(entry) {
+        await this.store.put('outbox', {
+            ...entry,
+            createdAt: new Date().toISOString(),
+            attempts: 0
+        });
+        window.dispatchEvent(new CustomEvent('uks:queue-changed'));
+    }
+
+    async pending() {
+        const entries = await this.store.getAll('outbox');
+        return entries.sort((a, b) => a.createdAt.localeCompare(b.createdAt));
+    }
+
+    /**
+     * Send queued writes oldest-first; stops at the first failure that will be retried
+     * @returns {Promise<Object>} { sent, failed, remaining }
+     */
+    replay() {
+        if (!this.replaying) {
+            this.replaying = this._replay().finally(() => { this.replaying = null; });
+        }
+        return this.replaying;
+    }
+
+    async _replay() {
+        const result = { sent: 0, failed: [], remaining: 0 };
+        const entries = await this.pending();
+
+        for (let i = 0; i < entries.length; i++) {
+            const entry = entries[i];
+            // Urutan dijaga: entri yang sedang backoff menahan entri sesudahnya
+            if (entry.retryAt && Date.now() < entry.retryAt) {
+                result.remaining = entries.length - i;
+                break;
+            }
+            try {
+                const response = await window.apiClient.request(
+                    entry.endpoint, entry.method, entry.data, 10000,
+                    { 'Idempotency-Key': entry.idempotencyKey }
+                );
+                await this.store.delete('outbox', entry.idempotencyKey);
+                await this._applyToCache(entry, response.data);
+                result.sent++;
+            } catch (error) {
+                // Koneksi putus tidak dihitung sebagai percobaan: dicoba lagi di interval/event online berikutnya
+                if (isNetworkError(error)) {
+                    result.remaining = entries.length - i;
+                    break;
+                }
+                // 408/409/429/5xx = server sibuk, sedang restart atau gagal sementara: coba lagi nanti
+                entry.attempts++;
+                if (isRetryableError(error) && entry.attempts < OFFLINE_MAX_ATTEMPTS) {
+                    entry.retryAt = Date.now() + replayBackoff(entry.attempts);
+                    await this.store.put('outbox', entry);
+                    result.remaining = entries.length - i;
+                    break;
+                }
+                if (isRetryableError(error)) {
+                    error.message = `${error.message} (gagal ${entry.attempts} kali)`;
+                }
+                // Ditolak server (validasi dsb.) atau batas percobaan habis: buang agar antrian tidak macet
+                await this.store.delete('outbox', entry.idempotencyKey);
+                if (entry.method === 'POST') {
+                    await this.store.delete(entry.resource, entry.localId);
+                }
+                result.failed.push({ entry, message: error.message });
+            }
+        }
+
+        if (result.sent || result.failed.length) {
+            window.dispatchEvent(new CustomEvent('uks:synced', { detail: result }));
+            window.dispatchEvent(new CustomEvent('uks:queue-changed'));
+        }
+        return result;
+    }
+
+    async _applyToCache(entry, record) {
+        if (!record || !record.id) return;
+        if (entry.localId !== undefined && entry.localId !== record.id) {
+            await this.store.delete(entry.resource, entry.localId);
+        }
+        await this.store.put(entry.resource, record);
+    }
+}
+
+class OfflineData {
+    constructor() {
+        this.store = new OfflineStore();
+        this.queue = new WriteQueue(this.store);
+    }
+
+    /**
+     * Read a collection: cached copy first (via onCached), then network
+     * @param {string} resource - 'obat' or 'pasien'
+     * @param {Function} fetcher - Async function calling the real API
+     * @param {Function} onCached - Optional callback receiving the cached response
+     * @returns {Promise<Object>} Fresh response, or cached response when offline
+     */
+    async read(resource, fetcher, onCached = null) {
+        const cached = await this._cachedResponse(resource);
+        if (cached && onCached) {
+            onCached(cached);
+        }
+
+        try {
+            const response = await fetcher();
+            if (response.success && Array.isArray(response.data)) {
+                // Write yang masih antri tetap terlihat di atas snapshot server
+                response.data = await this._applyPending(resource, response.data);
+                this.store.replaceAll(resource, response.data).catch(error => {
+                    console.warn(`Gagal menyimpan cache ${resource}:`, error);
+                });
+            }
+            return response;
+        } catch (error) {
+            if (isNetworkError(error) && cached) {
+                return { ...cached, offline: true };
+            }
+            throw error;
+        }
+    }
+
+    /**
+     * Send a write, queueing it when the server cannot be reached
+     * @param {Object} options - { resource, method, endpoint, data, send, localRecord }
+     * @returns {Promise<Object>} Server response, or a queued placeholder response
+     */
+    async write({ resource, method, endpoint, data, send, localRecord }) {
+        const idempotencyKey = generateIdempotencyKey();
+        try {
+            const response = await send(idempotencyKey);
+            if (response.success && response.data) {
+                this.store.put(resource, response.data).catch(() => {});
+            }
+            return response;
+        } catch (error) {
+            if (!isNetworkError(error)) throw error;
+
+            const record = { ...localRecord, pending: true };
+            try {
+                await this.queue.enqueue({ idempotencyKey, resource, method, endpoint, data, localId: record.id });
+                await this.store.put(resource, record);
+            } catch (storeError) {
+                // Tanpa IndexedDB write tidak bisa ditunda
+                console.error('Gagal menyimpan antrian offline:', storeError);
+                throw error;
+            }
+            return {
+                success: true,
+                queued: true,
+                data: record,
+                message: 'Tidak ada koneksi - data disimpan dan akan dikirim otomatis'
+            };
+        }
+    }
+
+    async _cachedResponse(resource) {
+        try {
+            const data = await this.store.getAll(resource);
+            if (!data.length) return null;
+            return {
+                success: true,
+                data: data,
+                fromCache: true,
+                message: 'Data dari cache lokal'
+            };
+        } catch (error) {
+            return null;
+        }
+    }
+
+    async _applyPending(resource, serverData) {
+        try {
+            const entries = (await this.queue.pending()).filter(e => e.resource === resource);
+            if (!entries.length) return serverData;
+
+            const local = new Map((await this.store.getAll(resource)).map(record => [record.id, record]));
+            const data = [...serverData];
+            entries.forEach(entry => {
+                const record = local.get(entry.localId);
+                if (!record) return;
+                const index = data.findIndex(item => item.id === entry.localId);
+                if (index === -1) {
+                    data.push(record);
+                } else {
+                    data[index] = record;
+                }
+            });
+            return data;
+        } catch (error) {
+            return serverData;
+        }
+    }
+}
+
+const offlineData = new OfflineData();
+
+/**
+ * Replay queued writes now and whenever the connection comes back
+ */
+function startOfflineSync() {
+    const replay = () => {
+        if (navigator.onLine === false) return;
+        offlineData.queue.replay().then(result => {
+            if (result.sent && typeof showToast === 'function') {
+                showToast(`${result.sent} data offline berhasil dikirim`, 'success');
+            }
+            result.failed.forEach(({ message }) => {
+                if (typeof showToast === 'function') {
+                    showToast(`Data offline ditolak server: ${message}`, 'error');
+                }
+            });
+        }).catch(error => console.warn('Gagal mengirim antrian offline:', error));
+    };
+
+    window.addEventListener('online', replay);
+    setInterval(replay, OFFLINE_REPLAY_INTERVAL);
+    replay();
+}
+
+/**
+ * Register service worker for the app shell
+ */
+function registerServiceWorker() {
+    if (!('serviceWorker' in navigator)) return;
+    navigator.serviceWorker.register('sw.js').catch(error => {
+        console.warn('Service worker registration failed:', error);
+    });
+}
+
+document.addEventListener('DOMContentLoaded', function() {
+    registerServiceWorker();
+    startOfflineSync();
+});
+
+// Export untuk digunakan di file lain
+window.offlineData = offlineData;
+window.generateIdempotencyKey = generateIdempotencyKey;
+window.isNetworkError = isNetworkError;
@@ -6,11 +6,18 @@
 // Global variables
 let pasienData = [];
 let filteredData = [];
+let arsipInfo = null;
+let loadedArsipDates = new Set();
 
 document.addEventListener('DOMContentLoaded', function() {
     initializePasien();
 });
 
+// Reload after queued offline writes reach the server
+window.addEventListener('uks:synced', function() {
+    loadPasienData();
+});
+
 /**
  * Initialize pasien page
  */
@@ -42,12 +49,21 @@ async function loadPasienData() {
         showTableLoading();
         
         // Use API wrapper that switches between real and mock API
-        const response = await api.getAllPasien();
+        // Cached data from IndexedDB renders immediately, fresh data replaces it
+        const response = await api.getAllPasien(cached => {
+            pasienData = cached.data;
+            applyFilters(document.getElementById('searchPasien').value.toLowerCase());
+        });
         
         if (response.success) {
             pasienData = response.data;
-            filteredData = [...pasienData];
-            renderPasienTable();
+            arsipInfo = response.arsip || null;
+            loadedArsipDates = new Set();
+            applyFilters(document.getElementById('searchPasien').value.toLowerCase());
+            
+            if (response.offline) {
+                showAlert('Offline - menampilkan data tersimpan', 'warning');
+            }
         } else {
             throw new Error(response.message || 'Gagal memuat data pasien');
         }
@@ -106,6 +122,7 @@ function renderPasienTable() {
                     <div class="d-flex align-items-center">
                         <i class="bi bi-person-circle me-2 text-success"></i>
                         <div class="fw-bold">${pasien.nama}</div>
+                        ${pasien.pending ? '<span class="badge bg-warning text-dark ms-2" title="Menunggu koneksi"><i class="bi bi-cloud-arrow-up"></i></span>' : ''}
                     </div>
                 </td>
                 <td>
@@ -184,11 +201,35 @@ function handleSearch() {
 /**
  * Handle filter functionality
  */
-function handleFilter() {
+async function handleFilter() {
+    const tanggalFilter = document.getElementById('filterTanggal').value;
+    await ensureArsipLoaded(tanggalFilter);
+    
     const searchTerm = document.getElementById('searchPasien').value.toLowerCase();
     applyFilters(searchTerm);
 }
 
+/**
+ * Load archived visits for a date older than the hot data set
+ * @param {string} tanggal - Date in YYYY-MM-DD format
+ */
+async function ensureArsipLoaded(tanggal) {
+    if (!tanggal || !arsipInfo || !arsipInfo.batasArsip) return;
+    if (tanggal >= arsipInfo.batasArsip || loadedArsipDates.has(tanggal)) return;
+    
+    try {
+        const response = await api.getPasienByRange(tanggal, tanggal);
+        if (response.success) {
+            const knownIds = new Set(pasienData.map(p => p.id));
+            pasienData = pasienData.concat(response.data.filter(p => !knownIds.has(p.id)));
+            loadedArsipDates.add(tanggal);
+        }
+    } catch (error) {
+        console.error('Error loading archived pasien data:', error);
+        showAlert('Gagal memuat data arsip', 'warning');
+    }
+}
+
 /**
  * Apply search and filters
  */
@@ -276,7 +317,11 @@ async function handleAddPasien(event) {
             event.target.reset();
             setDefaultDateTime(); // Reset to current date/time
             
-            showAlert('Kunjungan pasien berhasil dicatat', 'success');
+            if (response.queued) {
+                showAlert(response.message, 'warning');
+            } else {
+                showAlert('Kunjungan pasien berhasil dicatat', 'success');
+            }
         } else {
             throw new Error(response.message || 'Gagal mencatat kunjungan pasien');
         }
@@ -396,13 +441,15 @@ function setDefaultDateTime() {
 /**
  * Generate daily report
  */
-function generateDailyReport() {
+async function generateDailyReport() {
     const reportDate = document.getElementById('reportDate').value;
     if (!reportDate) {
         showAlert('Pilih tanggal untuk laporan', 'warning');
         return;
     }
     
+    await ensureArsipLoaded(reportDate);
+    
     // Filter patients by selected date
     const dailyPatients = pasienData.filter(p => p.tanggal_kunjungan === reportDate);
     
@@ -509,6 +556,22 @@ function generateDailyReport() {
     showAlert(`Laporan harian berhasil dibuat untuk ${totalPatients} kunjungan`, 'success');
 }
 
+/**
+ * Download daily or monthly visit report generated on the server
+ * @param {string} jenis - kunjungan_harian or kunjungan_bulanan
+ * @param {string} format - csv, xlsx or pdf
+ */
+function downloadPasienReport(jenis, format) {
+    const reportDate = document.getElementById('reportDate').value;
+    if (!reportDate) {
+        showAlert('Pilih tanggal untuk laporan', 'warning');
+        return;
+    }
+    
+    const params = jenis === 'kunjungan_bulanan' ? { bulan: reportDate.slice(0, 7) } : { tanggal: reportDate };
+    downloadReport(jenis, format, params);
+}
+
 /**
  * Print daily report
  */
@@ -610,4 +673,5 @@ async function refreshPasienData() {
 window.clearFilters = clearFilters;
 window.refreshPasienData = refreshPasienData;
 window.generateDailyReport = generateDailyReport;
-window.printDailyReport = printDailyReport;
\ No newline at end of file
+window.printDailyReport = printDailyReport;
+window.downloadPasienReport = downloadPasienReport;
\ No newline at end of file
@@ -0,0 +1,90 @@
+/**
+ * Service Worker untuk Sistem UKS Sekolah
+ * Menyimpan app shell (HTML, CSS, JS, ikon) agar halaman tetap terbuka tanpa koneksi.
+ * Data API tidak di-cache di sini; itu ditangani IndexedDB di assets/js/offline.js
+ */
+
+// Naikkan versi jika daftar APP_SHELL berubah; cache lama dihapus saat activate
+const SHELL_CACHE = 'uks-shell-v2';
+
+const APP_SHELL = [
+    './',
+    'index.html',
+    'inventaris.html',
+    'pasien.html',
+    'assets/css/style.css',
+    'assets/js/navigation.js',
+    'assets/js/offline.js',
+    'assets/js/api.js',
+    'assets/js/dashboard.js',
+    'assets/js/inventaris.js',
+    'assets/js/pasien.js',
+    'assets/images/favicon.ico',
+    'assets/images/uks-logo.svg'
+];
+
+const CDN_ASSETS = [
+    'https://cdn.jsdelivr.net/npm/bootstrap@5.3.0/dist/css/bootstrap.min.css',
+    'https://cdn.jsdelivr.net/npm/bootstrap@5.3.0/dist/js/bootstrap.bundle.min.js',
+    'https://cdn.jsdelivr.net/npm/bootstrap-icons@1.10.0/font/bootstrap-icons.css'
+];
+
+self.addEventListener('install', event => {
+    event.waitUntil(
+        caches.open(SHELL_CACHE).then(async cache => {
+            await cache.addAll(APP_SHELL);
+            // CDN boleh gagal tanpa membatalkan instalasi
+            await Promise.all(CDN_ASSETS.map(url => cache.add(url).catch(() => null)));
+        }).then(() => self.skipWaiting())
+    );
+});
+
+self.addEventListener('activate', event => {
+    event.waitUntil(
+        caches.keys().then(keys => Promise.all(
+            keys.filter(key => key !== SHELL_CACHE).map(key => caches.delete(key))
+        )).then(() => self.clients.claim())
+    );
+});
+
+self.addEventListener('fetch', event => {
+    const request = event.request;
+    if (request.method !== 'GET') return;
+
+    const url = new URL(request.url);
+    if (url.pathname.startsWith('/api/')) return;
+
+    // Halaman, JS dan CSS milik app: network-first agar HTML baru tidak berjalan
+    // dengan script versi lama setelah deploy; cache hanya dipakai saat offline
+    const isAppCode = url.origin === self.location.origin && /\.(js|css)$/.test(url.pathname);
+    if (request.mode === 'navigate' || isAppCode) {
+        event.respondWith(
+            fetch(request).then(response => {
+                if (response.ok) {
+                    const copy = response.clone();
+                    caches.open(SHELL_CACHE).then(cache => cache.put(request, copy));
+                }
+                return response;
+            }).catch(() => caches.match(request).then(cached => {
+                if (cached) return cached;
+                if (request.mode !== 'navigate') return Response.error();
+                return caches.match('index.html').then(page => page || Response.error());
+            }))
+        );
+        return;
+    }
+
+    // Gambar dan aset CDN (berversi di URL): stale-while-revalidate
+    event.respondWith(
+        caches.match(request).then(cached => {
+            const network = fetch(request).then(response => {
+                if (response.ok) {
+                    const copy = response.clone();
+                    caches.open(SHELL_CACHE).then(cache => cache.put(request, copy));
+                }
+                return response;
+            }).catch(() => cached || Response.error());
+            return cached || network;
+        })
+    );
+});